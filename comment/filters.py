@@ -3,11 +3,12 @@ import rest_framework_filters as filters
 
 from utils.utils import Utils
 from utils.filters import add_date_filtering
+from search.filters import FullTextFilter
 from comment.models import Comment
 
 
 class CommentFilter(filters.FilterSet):
-	desc__icontains = filters.CharFilter(name='desc', lookup_type='icontains')
+	desc__icontains = FullTextFilter(name='desc')
 	user_ids = filters.MethodFilter(action='userid_filter')
 
 	def userid_filter(self, name, queryset, value):
@@ -25,8 +26,19 @@ class CommentFilter(filters.FilterSet):
 
 	class Meta:
 		model = Comment
-		fields = ('desc',)
+		fields = ('desc', 'approved_comment')
 		date_fields = ('created_on', 'updated_on')
+		date_range_fields = ('created_on', 'updated_on')
 
 
 add_date_filtering(CommentFilter)
+
+
+class CommentModerationFilter(CommentFilter):
+	"""
+	Comments across posts, for the moderation endpoint
+	"""
+
+	class Meta(CommentFilter.Meta):
+		fields = CommentFilter.Meta.fields + ('post',)
+
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import serializers
+
+from comment.models import Comment
+from comment.serializers import CommentSerializer, serializer_skip_null_to_representation, \
+	uncompiled_skip_null_to_representation
+from post.models import Post
+
+
+class Command(BaseCommand):
+	help = ('Microbenchmark of Serializer.to_representation, serializes a page of in memory comments (no DB access) '
+	        'with the compiled representation plan and without it')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--rows', type=int, default=1000)
+		parser.add_argument('--repeat', type=int, default=20, help='runs of each, best time is reported')
+
+	def comments(self, rows):
+		now = timezone.now()
+		user = get_user_model()(pk=1, first_name='First', last_name='Last')
+		post = Post(pk=1, user=user, title='title', desc='desc', created_on=now, updated_on=now)
+		comments = []
+		for i in range(1, rows + 1):
+			# every other one a reply to the previous one
+			comment = Comment(pk=i, post=post, user=user, desc='comment {0}'.format(i), created_on=now, updated_on=now,
+			                  comment=comments[-1] if comments and i % 2 else None, reply_count=i % 3)
+			comments.append(comment)
+		return comments
+
+	def run(self, implementation, comments, depth, repeat):
+		serializers.Serializer.to_representation = implementation
+		best = None
+		for i in range(repeat):
+			start = time.perf_counter()
+			CommentSerializer(comments, many=True, depth=depth).data
+			elapsed = time.perf_counter() - start
+			best = elapsed if best is None else min(best, elapsed)
+		return best
+
+	def handle(self, *args, **options):
+		comments = self.comments(options['rows'])
+		try:
+			for depth in (0, CommentSerializer.max_depth):
+				before = self.run(uncompiled_skip_null_to_representation, comments, depth, options['repeat'])
+				after = self.run(serializer_skip_null_to_representation, comments, depth, options['repeat'])
+				self.stdout.write('depth={0}, {1} rows: {2:.2f}ms -> {3:.2f}ms ({4:.0f}% faster)'.format(
+					depth, options['rows'], before * 1000, after * 1000, (before - after) / before * 100))
+		finally:
+			serializers.Serializer.to_representation = serializer_skip_null_to_representation
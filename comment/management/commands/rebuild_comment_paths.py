@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from comment.models import Comment
+
+
+class Command(BaseCommand):
+	help = "(Re)builds Comment.path/depth, e.g. for comments created before the materialized path was added"
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000)
+
+	def handle(self, *args, **options):
+		size = options['batch_size']
+		start = time.time()
+		count = fixed = 0
+
+		# A reply is always created after (has a greater pk than) its parent, so walking in pk order the parent's path
+		# is always already correct by the time we get to the reply
+		last_pk = 0
+		while True:
+			chunk = list(Comment.objects.filter(pk__gt=last_pk).order_by('pk').values_list(
+				'pk', 'comment_id', 'path')[:size])
+			if not chunk:
+				break
+
+			paths = {pk: path for pk, parent_id, path in chunk}
+			missing = set(parent_id for pk, parent_id, path in chunk if parent_id and parent_id not in paths)
+			paths.update(Comment.objects.filter(pk__in=missing).values_list('pk', 'path'))
+
+			with transaction.atomic():
+				for pk, parent_id, path in chunk:
+					new_path = (paths.get(parent_id, '') if parent_id else '') + Comment.path_step(pk)
+					if new_path != path:
+						Comment.objects.filter(pk=pk).update(
+							path=new_path, depth=len(new_path) // Comment.PATH_STEP - 1)
+						fixed += 1
+					paths[pk] = new_path
+
+			count += len(chunk)
+			last_pk = chunk[-1][0]
+
+		self.stdout.write('{0} comments checked, {1} fixed in {2:.1f}s'.format(count, fixed, time.time() - start))
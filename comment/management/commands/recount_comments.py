@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from comment.models import Comment, recount_comment_counts, recount_reply_counts
+from post.models import Post
+
+
+def _pk_chunks(queryset, size):
+	# keyset walk over the pks, no OFFSET
+	last_pk = None
+	queryset = queryset.order_by('pk')
+	while True:
+		chunk = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+		chunk = list(chunk.values_list('pk', flat=True)[:size])
+		if not chunk:
+			return
+		yield chunk
+		last_pk = chunk[-1]
+
+
+class Command(BaseCommand):
+	help = 'Recomputes the denormalized Post.comment_count and Comment.reply_count counters, fixing any drift'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000)
+
+	def handle(self, *args, **options):
+		size = options['batch_size']
+
+		for model, recount, field in ((Post, recount_comment_counts, 'comment_count'),
+		                              (Comment, recount_reply_counts, 'reply_count')):
+			start = time.time()
+			checked = fixed = 0
+			for pks in _pk_chunks(model.objects.all(), size):
+				fixed += recount(pks)
+				checked += len(pks)
+			self.stdout.write('{0}.{1}: {2} checked, {3} fixed in {4:.1f}s'.format(
+				model._meta.object_name, field, checked, fixed, time.time() - start))
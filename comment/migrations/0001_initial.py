@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+# The schema from before the app had migrations, a database created by syncdb then takes it with
+# 'manage.py migrate --fake-initial'
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+	initial = True
+
+	dependencies = [
+		migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+		('post', '0001_initial'),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name='Comment',
+			fields=[
+				('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('desc', models.CharField(max_length=1000)),
+				('created_on', models.DateTimeField()),
+				('updated_on', models.DateTimeField()),
+				('approved_comment', models.BooleanField(default=True)),
+				('comment', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comment_on_comment', to='comment.Comment')),
+				('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='post.Post')),
+				('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='comment_user', to=settings.AUTH_USER_MODEL)),
+			],
+			options={
+				'abstract': False,
+			},
+		),
+	]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.baseconv import base36
+
+PATH_STEP = 7  # as Comment.PATH_STEP
+BATCH_SIZE = 1000
+
+
+def path_step(pk):
+	return base36.encode(pk).rjust(PATH_STEP, '0')
+
+
+def fill_paths(apps, schema_editor):
+	"""
+	Sets path/depth of the existing comments, as 'manage.py rebuild_comment_paths' does. A reply has a greater pk than
+	its parent, walking in pk order the parent's path is always set first
+	"""
+	Comment = apps.get_model('comment', 'Comment')
+	last_pk = 0
+	while True:
+		chunk = list(Comment.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'comment_id')[:BATCH_SIZE])
+		if not chunk:
+			return
+
+		paths = dict(Comment.objects.filter(
+			pk__in=set(parent_id for pk, parent_id in chunk if parent_id)).values_list('pk', 'path'))
+		for pk, parent_id in chunk:
+			path = (paths.get(parent_id, '') if parent_id else '') + path_step(pk)
+			Comment.objects.filter(pk=pk).update(path=path, depth=len(path) // PATH_STEP - 1)
+			paths[pk] = path
+		last_pk = chunk[-1][0]
+
+
+def set_counts(queryset, field, counts):
+	by_count = defaultdict(list)
+	for pk, count in counts:
+		by_count[count].append(pk)
+	for count, pks in by_count.items():
+		for i in range(0, len(pks), BATCH_SIZE):
+			queryset.filter(pk__in=pks[i:i + BATCH_SIZE]).update(**{field: count})
+
+
+def fill_counters(apps, schema_editor):
+	"""
+	Sets Post.comment_count and Comment.reply_count of the existing rows (0 until now), as 'manage.py
+	recount_comments' does
+	"""
+	Comment, Post = apps.get_model('comment', 'Comment'), apps.get_model('post', 'Post')
+	approved = Comment.objects.filter(approved_comment=True).order_by()
+	set_counts(Post.objects.all(), 'comment_count', approved.values_list('post_id').annotate(count=Count('id')))
+	set_counts(Comment.objects.all(), 'reply_count', approved.exclude(comment=None).values_list(
+		'comment_id').annotate(count=Count('id')))
+
+
+class Migration(migrations.Migration):
+
+	dependencies = [
+		('comment', '0001_initial'),
+		('post', '0002_comment_count_and_indexes'),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name='comment',
+			name='depth',
+			field=models.PositiveSmallIntegerField(default=0, editable=False),
+		),
+		migrations.AddField(
+			model_name='comment',
+			name='path',
+			field=models.CharField(default='', editable=False, max_length=252),
+		),
+		migrations.AddField(
+			model_name='comment',
+			name='reply_count',
+			field=models.PositiveIntegerField(default=0),
+		),
+		migrations.AlterField(
+			model_name='comment',
+			name='created_on',
+			field=models.DateTimeField(db_index=True),
+		),
+		migrations.AlterField(
+			model_name='comment',
+			name='updated_on',
+			field=models.DateTimeField(db_index=True),
+		),
+		migrations.RunPython(fill_paths, migrations.RunPython.noop),
+		migrations.RunPython(fill_counters, migrations.RunPython.noop),
+		migrations.AlterIndexTogether(
+			name='comment',
+			index_together=set([('approved_comment', 'id'), ('post', 'path'), ('approved_comment', 'post'), ('post', 'id')]),
+		),
+	]
@@ -1,22 +1,208 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import models, transaction
+from django.db.models import F, Count, Value
+from django.db.models.functions import Concat, Substr
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.baseconv import base36
 
 from settings import settings
-from utils.models import BlankModel
+from search.mixins import SearchIndexMixin
+from utils.cache import CacheVersions, CacheVersionedMixin
+from utils.models import BlankModel, add_to_counter
 from post.models import Post
 
 
-class Comment(BlankModel):
+class Comment(CacheVersionedMixin, SearchIndexMixin, BlankModel):
 	post = models.ForeignKey('post.Post', related_name='comments', on_delete=models.CASCADE)
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='comment_user', null=True, on_delete=models.SET_NULL)
 	desc = models.CharField(max_length=1000)
-	created_on = models.DateTimeField()
-	updated_on = models.DateTimeField()
+	created_on = models.DateTimeField(db_index=True)
+	updated_on = models.DateTimeField(db_index=True)
 	comment = models.ForeignKey('self', related_name='comment_on_comment', null=True, on_delete=models.CASCADE)
 	approved_comment = models.BooleanField(default=True)
+	reply_count = models.PositiveIntegerField(default=0)  # approved direct replies
+
+	# Materialized path of the thread: fixed width base36 id of each ancestor and then of self, so that a whole thread
+	# is one range read ordered by path (parents before their replies)
+	path = models.CharField(max_length=252, default='', editable=False)
+	depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+	PATH_STEP = 7  # 36^7 ids
+	MAX_DEPTH = 252 // PATH_STEP - 1
+
+	search_index_fields = (('desc', 1.0),)
+
+	class Meta:
+		index_together = (
+			('post', 'id'),  # comment list of a post, newest first
+			('post', 'path'),
+			('approved_comment', 'post'),  # list filtered on approved_comment
+			('approved_comment', 'id'),  # moderation queue across posts, newest first
+		)
+
+	# What a comment is currently counted in i.e (post_id, parent comment_id) - see Post.comment_count and
+	# reply_count - None if it isn't counted (not approved/not saved yet), _UNKNOWN until looked up
+	_UNKNOWN = object()
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+
+		# don't touch deferred fields here, that would load them (one query per row)
+		deferred = self.get_deferred_fields()
+		if deferred.intersection(('post_id', 'comment_id', 'approved_comment')):
+			self._counted = self._UNKNOWN
+		else:
+			self._counted = (self.post_id, self.comment_id) if self.pk and self.approved_comment else None
+
+		# parent the loaded path was built for, see _update_path()
+		self._path_parent = self._UNKNOWN if deferred.intersection(('comment_id', 'path')) else self.comment_id
+
+	def get_counted(self):
+		if self._counted is self._UNKNOWN:
+			row = Comment.objects.filter(pk=self.pk).values_list('post_id', 'comment_id', 'approved_comment').first()
+			self._counted = row[:2] if row and row[2] else None
+		return self._counted
 
 	def save(self, *args, **kwargs):
 		if not self.id:
 			self.created_on = timezone.now()
 		self.updated_on = timezone.now()
-		return super(Comment, self).save(*args, **kwargs)
\ No newline at end of file
+
+		with transaction.atomic():
+			counted = (self.post_id, self.comment_id) if self.approved_comment else None
+			previous = self.get_counted()
+			# read by get_cache_versions() once saved
+			self._changes_comment_count = (counted and counted[0]) != (previous and previous[0])
+
+			ret = super(Comment, self).save(*args, **kwargs)
+			self._update_path()
+
+			if counted != previous:
+				if previous:
+					adjust_comment_counters(*previous, delta=-1)
+				if counted:
+					adjust_comment_counters(*counted, delta=1)
+				self._counted = counted
+		return ret
+
+	@classmethod
+	def path_step(cls, pk):
+		return base36.encode(pk).rjust(cls.PATH_STEP, '0')
+
+	def _update_path(self):
+		"""
+		Sets path/depth once saved (the path ends with our own pk), moves the replies along if the parent has changed
+		"""
+		if self.path and self._path_parent == self.comment_id:
+			return  # nothing changed since loaded/last saved
+
+		parent_path = ''
+		if self.comment_id:
+			parent_path = Comment.objects.filter(pk=self.comment_id).values_list('path', flat=True).first() or ''
+
+		old_path = self.path
+		path = parent_path + self.path_step(self.pk)
+		depth = len(path) // self.PATH_STEP - 1
+		if path != old_path:
+			Comment.objects.filter(pk=self.pk).update(path=path, depth=depth)
+
+			if old_path:
+				Comment.objects.filter(post_id=self.post_id, path__startswith=old_path).exclude(pk=self.pk).update(
+					path=Concat(Value(path), Substr('path', len(old_path) + 1)),
+					depth=F('depth') + (depth - (len(old_path) // self.PATH_STEP - 1))
+				)
+
+		self.path, self.depth, self._path_parent = path, depth, self.comment_id
+
+	def get_cache_versions(self):
+		# 'posts' because the post list shows comment_count, only when that changes (comment added, removed, approved
+		# or rejected) - editing a comment would otherwise invalidate every cached post list
+		if getattr(self, '_changes_comment_count', True):
+			return 'posts', 'post:{0}'.format(self.post_id)
+		return 'post:{0}'.format(self.post_id),
+
+
+def adjust_comment_counters(post_id, parent_id, delta):
+	"""
+	Atomically adds 'delta' to the post's comment_count and to the parent comment's reply_count (if a reply)
+	"""
+	add_to_counter(Post.objects.filter(pk=post_id), 'comment_count', delta)
+	if parent_id:
+		add_to_counter(Comment.objects.filter(pk=parent_id), 'reply_count', delta)
+
+
+# Signals rather than delete() override so that cascaded deletes are covered too, no 'sender' as deferred
+# instances come with their own (sub) class
+
+@receiver(pre_delete, dispatch_uid='comment.models.resolve_deleted_comment')
+def resolve_deleted_comment(sender, instance, **kwargs):
+	if isinstance(instance, Comment):
+		instance._changes_comment_count = bool(instance.get_counted())
+
+
+@receiver(post_delete, dispatch_uid='comment.models.uncount_deleted_comment')
+def uncount_deleted_comment(sender, instance, **kwargs):
+	if isinstance(instance, Comment) and instance.get_counted():
+		adjust_comment_counters(*instance.get_counted(), delta=-1)
+
+
+def _apply_counts(queryset, field, counts):
+	"""
+	Sets 'field' of the objects in 'queryset' to their count in 'counts' (pk vs. count), 0 if not in there.
+	Only rows that are off get written, one UPDATE per distinct count value
+	:return: no. of rows fixed
+	"""
+	fixed = queryset.exclude(pk__in=list(counts)).exclude(**{field: 0}).update(**{field: 0})
+
+	by_count = defaultdict(list)
+	for pk, count in counts.items():
+		by_count[count].append(pk)
+	for count, pks in by_count.items():
+		fixed += queryset.filter(pk__in=pks).exclude(**{field: count}).update(**{field: count})
+	return fixed
+
+
+def recount_comment_counts(post_ids):
+	"""
+	Recomputes comment_count of the given posts from the comments table
+	:return: no. of posts which were off
+	"""
+	counts = Comment.objects.filter(post_id__in=post_ids, approved_comment=True).values_list('post_id').annotate(
+		count=Count('id')).order_by()
+	return _apply_counts(Post.objects.filter(pk__in=post_ids), 'comment_count', dict(counts))
+
+
+def recount_reply_counts(comment_ids):
+	"""
+	Recomputes reply_count of the given comments from the comments table
+	:return: no. of comments which were off
+	"""
+	counts = Comment.objects.filter(comment_id__in=comment_ids, approved_comment=True).values_list(
+		'comment_id').annotate(count=Count('id')).order_by()
+	return _apply_counts(Comment.objects.filter(pk__in=comment_ids), 'reply_count', dict(counts))
+
+
+def moderate_comments(queryset, approved):
+	"""
+	Approves/rejects all comments in 'queryset' with a single UPDATE, then recounts the counters of the posts and
+	parent comments involved
+	:return: no. of comments changed
+	"""
+	queryset = queryset.exclude(approved_comment=approved).order_by()
+
+	with transaction.atomic():
+		affected = list(queryset.values_list('post_id', 'comment_id').distinct())
+		if not affected:
+			return 0
+
+		updated = queryset.update(approved_comment=approved, updated_on=timezone.now())
+
+		post_ids = sorted(set(post_id for post_id, parent_id in affected))
+		recount_comment_counts(post_ids)
+		recount_reply_counts(sorted(set(parent_id for post_id, parent_id in affected if parent_id)))
+		CacheVersions.bump_on_commit('posts', *['post:{0}'.format(post_id) for post_id in post_ids])
+
+	return updated
@@ -1,4 +1,9 @@
-from django.db import models
+import copy
+import threading
+from collections import defaultdict
+
+from django.db import models, router
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 from rest_framework.utils import field_mapping
 from rest_framework.fields import OrderedDict, SkipField, empty, CharField, JSONField as BaseJSONField, IntegerField
@@ -8,6 +13,7 @@ from comment.models import Comment
 from post.models import Post
 from post.serializers import PostSerializer
 from user.mixins import AuthenticatedSerializerMixin
+from utils.serializers import EagerLoadingSerializerMixin, SparseFieldsSerializerMixin
 
 
 # Property descriptor to be used on the model instance for above field, similar to in-built
@@ -25,12 +31,15 @@ class IntegerAsForeignFieldDescriptor:
 		if pk is None:
 			return None
 
-		# use the saved related data, but only if it hasn't changed
-		if hasattr(self, 'value') and pk == getattr(self.value, self.field.remote_field_name):
-			return self.value
+		# use the related object cached on the instance, but only if it hasn't changed
+		cache_name = self.field.get_cache_name()
+		value = instance.__dict__.get(cache_name)
+		if value is not None and pk == getattr(value, self.field.remote_field_name):
+			return value
 
-		self.value = self.field.get_remote_obj(pk)
-		return self.value
+		value = self.field.get_remote_obj(pk)
+		instance.__dict__[cache_name] = value
+		return value
 
 	def __set__(self, instance, value):
 		if value is None and self.field.null is False:
@@ -51,7 +60,12 @@ class IntegerAsForeignFieldDescriptor:
 
 			pk = getattr(value, self.field.remote_field_name)
 			setattr(instance, self.field.attname, pk)  # update the related field
-			self.value = value  # Also save the related instance to avoid fetching it again in 'get'
+
+			# Also save the related instance (on the instance, not on this descriptor shared by all of them) to avoid
+			# fetching it again in 'get'
+			instance.__dict__[self.field.get_cache_name()] = value
+		else:
+			instance.__dict__.pop(self.field.get_cache_name(), None)
 
 
 # -----------------------------------------------
@@ -119,6 +133,69 @@ class IntegerAsForeignField(models.IntegerField):
 		# 	self.remote_field_name, type(pk).__name__))
 
 
+def prefetch_soft_fk(objects, *field_names):
+	"""
+	Resolves the IntegerAsForeignField fields of all 'objects' at once, with one IN query per remote model (and
+	database), instead of one query per object on access
+	:param objects: model instances (list or evaluated queryset) all of the same model
+	:param field_names: IntegerAsForeignField names to resolve, all if none
+	:return: objects
+	"""
+	if not objects:
+		return objects
+
+	fields = [field for field in objects[0]._meta.fields
+	          if isinstance(field, IntegerAsForeignField) and (not field_names or field.name in field_names)]
+
+	wanted = defaultdict(set)  # (remote model, remote field name, db) vs. values
+	for obj in objects:
+		for field in fields:
+			value = getattr(obj, field.attname)
+			if value is not None:
+				db = router.db_for_read(field.remote_model, instance=obj)
+				wanted[(field.remote_model, field.remote_field_name, db)].add(value)
+
+	resolved = {}
+	for (model, name, db), values in wanted.items():
+		for remote in model._default_manager.using(db).filter(**{name + '__in': values}):
+			resolved[(model, name, db, getattr(remote, name))] = remote
+
+	for obj in objects:
+		for field in fields:
+			value = getattr(obj, field.attname)
+			remote = resolved.get((field.remote_model, field.remote_field_name,
+			                       router.db_for_read(field.remote_model, instance=obj), value))
+			if remote is not None:
+				obj.__dict__[field.get_cache_name()] = remote
+	return objects
+
+
+# QuerySet whose prefetch_soft_fk() works like prefetch_related() for IntegerAsForeignField fields i.e. they get
+# resolved when the queryset is evaluated, so it can be used as a list view's queryset (pagination, filtering etc.
+# still apply). Models with IntegerAsForeignField fields should use it as their manager:
+#	objects = SoftForeignKeyQuerySet.as_manager()
+#
+class SoftForeignKeyQuerySet(models.QuerySet):
+	_soft_fk_prefetch = None
+
+	def prefetch_soft_fk(self, *field_names):
+		clone = self._clone()
+		clone._soft_fk_prefetch = field_names
+		return clone
+
+	def _clone(self, **kwargs):
+		clone = super()._clone(**kwargs)
+		clone._soft_fk_prefetch = self._soft_fk_prefetch
+		return clone
+
+	def _fetch_all(self):
+		fetch = self._result_cache is None
+		super()._fetch_all()
+		if fetch and self._soft_fk_prefetch is not None and self._result_cache and isinstance(
+				self._result_cache[0], models.Model):
+			prefetch_soft_fk(self._result_cache, *self._soft_fk_prefetch)
+
+
 # Model mixin, use this if your model has any IntegerAsForeignField field
 #
 class IntegerAsForeignFieldModelMixin:
@@ -149,33 +226,44 @@ class IntegerPrimaryKeySerializerField(serializers.ModelField):
 		kwargs.pop('max_value', None)
 		super().__init__(model_field, **kwargs)
 
+	# (parent serializer class, field name, depth) vs. nested serializer class
+	_nested_serializer_classes = {}
+
 	def get_nested_serializer_class(self):
 		parent = self.parent
 
 		# For 'applied_depth' see utils.serializers.ModelSerializer
 		cur_depth = getattr(parent, 'applied_depth', None) or getattr(parent.Meta, 'depth', None)
 		if cur_depth and int(cur_depth) >= 1:
-			# depth > 0, we need to provide serializer for expanding the field
-			# Check if parent serializer specifies any custom serializer for this field via 'get_nested_field_serializer_class'
-			# otherwise create and return the the default one
-			get_nested_serializers = getattr(parent, 'get_nested_field_serializer_class', None)
-			if get_nested_serializers and callable(get_nested_serializers):
-				ser = get_nested_serializers(self.field_name)
-				if ser:
-					# found one, create a copy with proper depth
-					class NestedSerializer(ser):
-						class Meta(ser.Meta):
-							ser.Meta.depth = cur_depth - 1
-
-					return NestedSerializer
-
-			# No custom serializer, lets just the use the default one
-			class NestedSerializer(serializers.ModelSerializer):
-				class Meta:
-					model = self.model_field.remote_model
-					depth = cur_depth - 1
-
-			return NestedSerializer
+			# Same class for every row, create it only once
+			key = (type(parent), self.field_name, cur_depth)
+			nested = self._nested_serializer_classes.get(key)
+			if nested is None:
+				nested = self._nested_serializer_classes[key] = self.build_nested_serializer_class(parent, cur_depth)
+			return nested
+
+	def build_nested_serializer_class(self, parent, cur_depth):
+		# depth > 0, we need to provide serializer for expanding the field
+		# Check if parent serializer specifies any custom serializer for this field via 'get_nested_field_serializer_class'
+		# otherwise create and return the the default one
+		get_nested_serializers = getattr(parent, 'get_nested_field_serializer_class', None)
+		if get_nested_serializers and callable(get_nested_serializers):
+			ser = get_nested_serializers(self.field_name)
+			if ser:
+				# found one, create a copy with proper depth (leaving the original's Meta alone)
+				class NestedSerializer(ser):
+					class Meta(ser.Meta):
+						depth = cur_depth - 1
+
+				return NestedSerializer
+
+		# No custom serializer, lets just the use the default one
+		class NestedSerializer(serializers.ModelSerializer):
+			class Meta:
+				model = self.model_field.remote_model
+				depth = cur_depth - 1
+
+		return NestedSerializer
 
 	def to_internal_value(self, data):
 		data = super().to_internal_value(data)
@@ -196,6 +284,53 @@ class IntegerPrimaryKeySerializerField(serializers.ModelField):
 serializers.ModelSerializer.serializer_field_mapping[IntegerAsForeignField] = IntegerPrimaryKeySerializerField
 
 
+def _get_depth(serializer):
+	if hasattr(serializer, 'applied_depth'):
+		return serializer.applied_depth
+	return getattr(serializer.Meta, 'depth', 0) if hasattr(serializer, 'Meta') else 0
+
+
+# (depth, ((field name, is a pk relation), ...)) vs. ((output key, output key if value is an int, check for int), ...)
+# Keyed on what the plan is compiled from rather than on the serializer class, nested serializer classes are created on
+# the fly (see build_nested_field()) and would each add their own. Field subsets and depths are few, so are the plans
+_representation_plans = {}
+
+
+def _compile_representation_plan(layout, depth):
+	plan = []
+	for field_name, is_relation in layout:
+		if not is_relation:
+			plan.append((field_name, field_name, False))
+		elif depth == 0:
+			# never expanded, always the pk
+			plan.append((field_name + '_id', field_name + '_id', False))
+		else:
+			# expanded unless the value turns out to be the pk
+			plan.append((field_name, field_name + '_id', True))
+	return tuple(plan)
+
+
+def get_representation_plan(serializer):
+	"""
+	:return: [(field.get_attribute, field.to_representation, key, int key, check for int), ...] for all fields of the
+	  serializer, bound once per serializer instance (a ListSerializer's child serves all the rows) and compiled once
+	  per depth and field layout
+	"""
+	plan = serializer.__dict__.get('_representation_plan')
+	if plan is None:
+		fields = serializer.fields
+		depth = _get_depth(serializer)
+		layout = tuple((name, isinstance(field, (PrimaryKeyRelatedField, IntegerPrimaryKeySerializerField)))
+		               for name, field in fields.items())
+		compiled = _representation_plans.get((depth, layout))
+		if compiled is None:
+			compiled = _representation_plans[(depth, layout)] = _compile_representation_plan(layout, depth)
+
+		plan = [(field.get_attribute, field.to_representation) + keys for field, keys in zip(fields.values(), compiled)]
+		serializer.__dict__['_representation_plan'] = plan
+	return plan
+
+
 def serializer_skip_null_to_representation(self, instance):
 	"""
 	Same as base class implementation but skips null values.
@@ -203,6 +338,26 @@ def serializer_skip_null_to_representation(self, instance):
 	Object instance -> Dict of primitive datatypes.
 	"""
 	ret = OrderedDict()
+	for get_attribute, to_representation, key, int_key, check_int in get_representation_plan(self):
+		try:
+			attribute = get_attribute(instance)
+		except SkipField:
+			continue
+
+		# Keeps only if it is non-null
+		if attribute is not None:
+			value = to_representation(attribute)
+			if value is not None:
+				ret[int_key if check_int and isinstance(value, int) else key] = value
+	return ret
+
+
+def uncompiled_skip_null_to_representation(self, instance):
+	"""
+	What serializer_skip_null_to_representation() does, without the plan - the reference for the plan (and the
+	baseline of 'manage.py bench_representation')
+	"""
+	ret = OrderedDict()
 	fields = [field for field in self.fields.values()]
 
 	depth = self.applied_depth if hasattr(self, 'applied_depth') else getattr(self.Meta, 'depth', 0) if hasattr(self, 'Meta') else 0
@@ -233,10 +388,15 @@ def serializer_skip_null_to_representation(self, instance):
 serializers.Serializer.to_representation = serializer_skip_null_to_representation
 
 
-class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsSerializerMixin, EagerLoadingSerializerMixin, AuthenticatedSerializerMixin,
+                        serializers.ModelSerializer):
 
 	author = serializers.SerializerMethodField()
 
+	field_sources = {
+		'author': ('user__first_name', 'user__last_name'),
+	}
+
 	def get_author(self, obj):
 		if obj.user:
 			return obj.user.get_author()
@@ -244,8 +404,8 @@ class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerialize
 
 	class Meta:
 		model = Comment
-		fields = ('id', 'post', 'author', 'desc', 'created_on', 'updated_on', 'comment')
-		read_only_fields = ('user', 'post', 'created_on', 'updated_on')
+		fields = ('id', 'post', 'author', 'desc', 'created_on', 'updated_on', 'comment', 'reply_count')
+		read_only_fields = ('user', 'post', 'created_on', 'updated_on', 'reply_count')
 		ignore_depth_fields = ('user',)
 
 	# maximum allowed depth for this serializer, relatively safe default of 1 (0?) :-) override if you need more
@@ -260,6 +420,24 @@ class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerialize
 	# 	# 'field_name': SerializerClass
 	# }
 
+	def get_post_id(self):
+		"""
+		:return: id of the post the comment is (being) written on, the updated comment's or the comment list's
+		"""
+		if self.instance is not None:
+			return self.instance.post_id
+		return int(self.context['view'].kwargs['pk'])
+
+	def validate_comment(self, value):
+		if value is not None:
+			if value.post_id != self.get_post_id():
+				raise serializers.ValidationError(_('cannot reply to a comment on another post'))
+			if value.depth >= Comment.MAX_DEPTH:
+				raise serializers.ValidationError(_('replies are nested too deep'))
+			if self.instance is not None and value.path.startswith(self.instance.path):
+				raise serializers.ValidationError(_('cannot reply to itself or to its own replies'))
+		return value
+
 	@classmethod
 	def _get_meta_or_class_property(cls, name, default=None):
 		"""
@@ -277,7 +455,6 @@ class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerialize
 		return d.get(field_name, default_field_class) if d else default_field_class
 
 	def __init__(self, *args, **kwargs):
-		self.requested_fields = kwargs.pop('fields', None)
 		self.requested_depth = kwargs.pop('depth', None)
 		super().__init__(*args, **kwargs)
 
@@ -290,6 +467,24 @@ class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerialize
 		if self.requested_depth and self.requested_depth > max_depth:
 			self.requested_depth = max_depth
 
+		# and apply it with a Meta of our own, the class' Meta is shared by all the requests (threads)
+		if self.requested_depth is not None and self.requested_depth != getattr(self.Meta, 'depth', None):
+			self.Meta = self.get_depth_meta(self.requested_depth)
+
+	# (serializer class, depth) vs. Meta class
+	_depth_metas = {}
+
+	@classmethod
+	def get_depth_meta(cls, depth):
+		meta = cls._depth_metas.get((cls, depth))
+		if meta is None:
+			class Meta(cls.Meta):
+				pass
+
+			Meta.depth = depth
+			meta = cls._depth_metas[(cls, depth)] = Meta
+		return meta
+
 	@property
 	def applied_depth(self):
 		if self.requested_depth:
@@ -328,19 +523,36 @@ class CommentSerializer(AuthenticatedSerializerMixin, serializers.ModelSerialize
 		# Nothing special to do, just pass on to super
 		return super().build_nested_field(field_name, relation_info, nested_depth)
 
+	# (serializer class, depth, requested fields) vs. fields as built by ModelSerializer.get_fields(), least recently
+	# used first - bounded, the requested fields are up to the client
+	_fields_cache = OrderedDict()
+	_fields_cache_size = 256
+	_fields_cache_lock = threading.Lock()
+
 	def get_fields(self):
 		"""
-		We override to apply 'depth' requested by client just before the call to super (and reset it back before returning)
-		:return:
+		We override to build the fields only once per (class, depth, requested fields), building them means going
+		through the model's fields and relations - every instance gets its own copy of them though, as fields get
+		bound to their serializer
 		"""
-		if self.requested_depth is not None:
-			default_depth = getattr(self.Meta, 'depth', None)
-			if default_depth != self.requested_depth:
-				self.Meta.depth = self.requested_depth
-				fields = super().get_fields()
-				if default_depth is not None:
-					self.Meta.depth = default_depth
-				else:
-					delattr(self.Meta, 'depth')
-				return fields
-		return super().get_fields()
+		requested_fields = None
+		if self.requested_fields is not None:
+			requested_fields = tuple(field for field in self.Meta.fields if field in self.requested_fields)
+		key = (type(self), self.applied_depth, requested_fields)
+
+		with self._fields_cache_lock:
+			fields = self._fields_cache.get(key)
+			if fields is not None:
+				self._fields_cache.move_to_end(key)
+		if fields is None:
+			fields = super().get_fields()
+			with self._fields_cache_lock:
+				self._fields_cache[key] = fields
+				while len(self._fields_cache) > self._fields_cache_size:
+					self._fields_cache.popitem(last=False)
+		return copy.deepcopy(fields)
+
+
+class CommentModerationSerializer(serializers.Serializer):
+	approved_comment = serializers.BooleanField()
+	ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
@@ -1,3 +1,321 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import models
+from rest_framework import serializers
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from comment import serializers as comment_serializers
+from comment.models import Comment
+from comment.serializers import CommentSerializer, IntegerAsForeignField, IntegerAsForeignFieldModelMixin, \
+	SoftForeignKeyQuerySet
+from comment.views import CommentListView, CommentDetailView, CommentTreeView
+from post.existence import known_posts
+from post.models import Post
+from user.models import Token
+from utils.cache import get_cache
+from utils.querybudget import query_budget
+
+
+def create_user(name):
+	user = get_user_model().objects.create_user(username=name, email=name + '@example.com', password='password123',
+	                                            first_name=name, last_name='Test')
+	return user, Token.objects.create(user=user, client_token=name)
+
+
+class SoftComment(IntegerAsForeignFieldModelMixin, models.Model):
+	"""
+	The comment table seen through soft foreign keys, no model in the apps uses IntegerAsForeignField. Its app isn't
+	installed, migrations leave it alone
+	"""
+	post = IntegerAsForeignField(remote_model=Post)
+	user = IntegerAsForeignField(remote_model=get_user_model(), null=True)
+
+	objects = SoftForeignKeyQuerySet.as_manager()
+
+	class Meta:
+		app_label = 'soft_foreign_key_tests'
+		db_table = 'comment_comment'
+		managed = False
+
+
+class CommentTestMixin(object):
+	def setUp(self):
+		get_cache().clear()
+		if known_posts:
+			known_posts.clear()
+		self.user, self.token = create_user('author')
+		self.post = Post.objects.create(user=self.user, title='title', desc='desc')
+		self.comments = [Comment.objects.create(post=self.post, user=self.user, desc='comment %d' % i)
+		                 for i in range(3)]
+
+	def authenticate(self):
+		self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+	def detail_url(self, comment):
+		# the detail url repeats the 'pk' group of the post's, it can't be reversed
+		return '{0}{1}/'.format(reverse('comment-list', kwargs={'pk': comment.post_id}), comment.pk)
+
+	def reply(self, parent, desc='reply', post=None):
+		return Comment.objects.create(post=post or self.post, user=self.user, desc=desc, comment=parent)
+
+	def get_results(self, url, **params):
+		"""
+		:return: 'results' of a list response, parsed from its content (the renderer splices cached fragments in)
+		"""
+		response = self.client.get(url, params)
+		self.assertEqual(response.status_code, 200)
+		return json.loads(response.content.decode('utf-8'))['results']
+
+
+class CommentReadTests(CommentTestMixin, APITestCase):
+	def test_list_query_budget(self):
+		with query_budget(CommentListView.query_budget, 'comment-list'):
+			results = self.get_results(reverse('comment-list', kwargs={'pk': self.post.pk}), **{'page-size': 100})
+		self.assertEqual([comment['id'] for comment in results], [comment.pk for comment in reversed(self.comments)])
+
+	def test_list_query_budget_depth(self):
+		with query_budget(CommentListView.query_budget, 'comment-list'):
+			results = self.get_results(reverse('comment-list', kwargs={'pk': self.post.pk}), depth=1)
+		self.assertEqual(results[0]['post']['id'], self.post.pk)
+
+	def test_detail_query_budget(self):
+		comment = self.comments[0]
+		with query_budget(CommentDetailView.query_budget, 'comment-detail'):
+			response = self.client.get(self.detail_url(comment))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['desc'], comment.desc)
+
+	def test_missing_post(self):
+		empty = Post.objects.create(user=self.user, title='empty', desc='desc')
+		self.assertEqual(self.get_results(reverse('comment-list', kwargs={'pk': empty.pk})), [])
+
+		response = self.client.get(reverse('comment-list', kwargs={'pk': empty.pk + 1}))
+		self.assertEqual(response.status_code, 404)
+
+
+class CommentCounterTests(CommentTestMixin, APITestCase):
+
+	def test_reply_counts(self):
+		first = self.comments[0]
+		reply = self.reply(first)
+		self.reply(first)
+		self.assertEqual(Comment.objects.get(pk=first.pk).reply_count, 2)
+
+		reply.delete()
+		self.assertEqual(Comment.objects.get(pk=first.pk).reply_count, 1)
+		self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 4)
+
+
+class CommentTreeTests(CommentTestMixin, APITestCase):
+	def get_tree(self, **params):
+		with query_budget(CommentTreeView.query_budget, 'comment-tree'):
+			response = self.client.get(reverse('comment-tree', kwargs={'pk': self.post.pk}), params)
+		self.assertEqual(response.status_code, 200)
+		return response.data['results']
+
+	def test_tree(self):
+		first, second, third = self.comments
+		reply = self.reply(first)
+		self.reply(reply, 'reply to reply')
+
+		tree = self.get_tree()
+		self.assertEqual([node['id'] for node in tree], [first.pk, second.pk, third.pk])
+		self.assertEqual([node['id'] for node in tree[0]['replies']], [reply.pk])
+		self.assertEqual([node['desc'] for node in tree[0]['replies'][0]['replies']], ['reply to reply'])
+
+		tree = self.get_tree(max_depth=0, limit=2)
+		self.assertEqual([(node['id'], node['replies']) for node in tree], [(first.pk, []), (second.pk, [])])
+
+	def test_reply_to_another_post(self):
+		other = Post.objects.create(user=self.user, title='other', desc='desc')
+		other_comment = Comment.objects.create(post=other, user=self.user, desc='comment')
+		self.authenticate()
+
+		response = self.client.post(reverse('comment-list', kwargs={'pk': self.post.pk}),
+		                            {'desc': 'reply', 'comment': other_comment.pk}, format='json')
+		self.assertEqual(response.status_code, 400)
+		self.assertIn('comment', response.data)
+
+		response = self.client.patch(self.detail_url(self.comments[0]), {'comment': other_comment.pk}, format='json')
+		self.assertEqual(response.status_code, 400)
+
+		response = self.client.post(reverse('comment-list', kwargs={'pk': self.post.pk}),
+		                            {'desc': 'reply', 'comment': self.comments[0].pk}, format='json')
+		self.assertEqual(response.status_code, 201)
+
+	def test_reply_to_own_reply(self):
+		first = self.comments[0]
+		reply = self.reply(first)
+		self.authenticate()
+
+		response = self.client.patch(self.detail_url(first), {'comment': reply.pk}, format='json')
+		self.assertEqual(response.status_code, 400)
+
+	def test_move_reply(self):
+		first, second = self.comments[:2]
+		reply = self.reply(first)
+		nested = self.reply(reply)
+		self.authenticate()
+
+		response = self.client.patch(self.detail_url(reply), {'comment': second.pk}, format='json')
+		self.assertEqual(response.status_code, 200)
+
+		nested = Comment.objects.get(pk=nested.pk)
+		self.assertTrue(nested.path.startswith(Comment.objects.get(pk=second.pk).path))
+		self.assertEqual(nested.depth, 2)
+		self.assertEqual([Comment.objects.get(pk=comment.pk).reply_count for comment in (first, second)], [0, 1])
+
+
+class CommentRepresentationTests(CommentTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.reply(self.comments[0])
+		self.queryset = Comment.objects.select_related('post', 'user', 'comment').order_by('pk')
+
+	def serialize(self, implementation, **kwargs):
+		serializers.Serializer.to_representation = implementation
+		try:
+			return CommentSerializer(self.queryset, many=True, **kwargs).data
+		finally:
+			serializers.Serializer.to_representation = comment_serializers.serializer_skip_null_to_representation
+
+	def test_plan_matches_uncompiled(self):
+		for kwargs in ({}, {'depth': 1}, {'fields': ['id', 'post', 'comment']}, {'depth': 1, 'fields': ['comment']}):
+			self.assertEqual(self.serialize(comment_serializers.serializer_skip_null_to_representation, **kwargs),
+			                 self.serialize(comment_serializers.uncompiled_skip_null_to_representation, **kwargs), kwargs)
+
+	def test_plans_shared_by_nested_classes(self):
+		self.serialize(comment_serializers.serializer_skip_null_to_representation, depth=1)
+		plans = len(comment_serializers._representation_plans)
+
+		# fields built again, nested serializer classes created anew
+		CommentSerializer._fields_cache.clear()
+		self.serialize(comment_serializers.serializer_skip_null_to_representation, depth=1)
+		self.assertEqual(len(comment_serializers._representation_plans), plans)
+
+
+class SoftForeignKeyTests(CommentTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.other_user, token = create_user('other')
+		self.other_post = Post.objects.create(user=self.user, title='other', desc='desc')
+		Comment.objects.create(post=self.other_post, user=self.other_user, desc='comment')
+
+	def test_prefetch(self):
+		with self.assertNumQueries(3):  # the comments, then one IN query per remote model
+			comments = list(SoftComment.objects.order_by('pk').prefetch_soft_fk())
+			self.assertEqual([(comment.post, comment.user) for comment in comments],
+			                 [(self.post, self.user)] * 3 + [(self.other_post, self.other_user)])
+
+		with self.assertNumQueries(2):  # only 'post' prefetched
+			comments = list(SoftComment.objects.order_by('pk').prefetch_soft_fk('post'))
+			self.assertEqual(comments[-1].post, self.other_post)
+		with self.assertNumQueries(1):
+			self.assertEqual(comments[-1].user, self.other_user)
+
+	def test_cached_per_instance(self):
+		first, last = SoftComment.objects.order_by('pk')[0], SoftComment.objects.order_by('-pk')[0]
+		with self.assertNumQueries(2):
+			self.assertEqual((first.post, last.post, first.post, last.post),
+			                 (self.post, self.other_post, self.post, self.other_post))
+
+		first.post_id = self.other_post.pk
+		self.assertEqual(first.post, self.other_post)
+		first.post = self.post
+		with self.assertNumQueries(0):
+			self.assertEqual(first.post, self.post)
+
+
+class CommentModerationTests(CommentTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.user.is_superuser = True
+		self.user.save()
+		self.authenticate()
+
+	def moderate(self, query, **data):
+		response = self.client.post(reverse('comment-moderate') + query, dict(data, approved_comment=False),
+		                            format='json')
+		return response.status_code, Comment.objects.filter(approved_comment=False).count()
+
+	def test_filter_or_ids_required(self):
+		self.assertEqual(self.moderate(''), (400, 0))
+		self.assertEqual(self.moderate('?post='), (400, 0))
+		self.assertEqual(self.moderate('?post=&approved_comment=&created_on__gte='), (400, 0))
+
+	def test_moderate(self):
+		self.assertEqual(self.moderate('', ids=[self.comments[0].pk]), (200, 1))
+		self.assertEqual(self.moderate('?post={0}'.format(self.post.pk)), (200, 3))
+
+
+class CommentExportTests(CommentTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.authenticate()
+
+	def export(self, post=None, **params):
+		"""
+		:return: the exported rows, as JSON and as NDJSON
+		"""
+		exports = []
+		url = reverse('comment-export', kwargs={'pk': (post or self.post).pk})
+		for format in ('json', 'ndjson'):
+			response = self.client.get(url, dict(params, format=format))
+			self.assertEqual(response.status_code, 200)
+			content = b''.join(response.streaming_content).decode('utf-8')
+			exports.append(json.loads(content) if format == 'json' else
+			               [json.loads(line) for line in content.splitlines()])
+		self.assertEqual(exports[0], exports[1])
+		return exports[0]
+
+	def test_export(self):
+		rows = self.export()
+		self.assertEqual([row['id'] for row in rows], [comment.pk for comment in self.comments])
+		self.assertEqual(rows[0]['author'], self.user.get_author())
+
+	def test_filters(self):
+		Comment.objects.filter(pk=self.comments[1].pk).update(approved_comment=False)
+		self.assertEqual([row['id'] for row in self.export(approved_comment='false')], [self.comments[1].pk])
+		self.assertEqual([row['id'] for row in self.export(desc='comment 2')], [self.comments[2].pk])
+
+	def test_empty(self):
+		self.assertEqual(self.export(desc='none'), [])
+		self.assertEqual(self.export(Post.objects.create(user=self.user, title='empty', desc='desc')), [])
+
+		response = self.client.get(reverse('comment-export', kwargs={'pk': self.post.pk + 100}))
+		self.assertEqual(response.status_code, 404)
+
+
+class CommentCacheInvalidationTests(CommentTestMixin, APITransactionTestCase):
+	"""
+	Cache versions are bumped once the write commits, hence transaction test cases
+	"""
+
+	def test_edit_shows_in_cached_list(self):
+		url = reverse('comment-list', kwargs={'pk': self.post.pk})
+		comment = self.comments[-1]
+		self.assertEqual(self.get_results(url)[0]['desc'], comment.desc)
+
+		self.authenticate()
+		response = self.client.patch(self.detail_url(comment), {'desc': 'edited'}, format='json')
+		self.assertEqual(response.status_code, 200)
+
+		self.client.credentials()
+		self.assertEqual(self.get_results(url)[0]['desc'], 'edited')
+
+	def test_author_rename_shows_in_cached_list(self):
+		url = reverse('comment-list', kwargs={'pk': self.post.pk})
+		author = self.get_results(url)[0]['author']
+
+		self.user.first_name = 'renamed'
+		self.user.save()
+		self.assertNotEqual(self.get_results(url)[0]['author'], author)
+
+	def test_deleted_post(self):
+		url = reverse('comment-list', kwargs={'pk': self.post.pk})
+		self.get_results(url)
+
+		self.post.delete()
+		self.assertEqual(self.client.get(url).status_code, 404)
@@ -1,8 +1,10 @@
 from django.conf.urls import url
 
-from comment.views import CommentListView, CommentDetailView
+from comment.views import CommentListView, CommentDetailView, CommentTreeView, CommentExportView
 
 urlpatterns = [
 	url(r'^$', CommentListView.as_view(), name='comment-list'),
 	url(r'^(?P<pk>[0-9]+)/$', CommentDetailView.as_view(), name='comment-detail'),
+	url(r'^tree/$', CommentTreeView.as_view(), name='comment-tree'),
+	url(r'^export/$', CommentExportView.as_view(), name='comment-export'),
 ]
\ No newline at end of file
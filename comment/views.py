@@ -1,38 +1,88 @@
+from collections import defaultdict
+
+from django.db import transaction, IntegrityError
 from django.http import Http404
 
+from django.utils.translation import ugettext_lazy as _
+
 from rest_framework import filters, exceptions
 from rest_framework_filters.backends import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from comment.models import Comment
-from comment.serializers import CommentSerializer
+from comment.models import Comment, moderate_comments
+from comment.serializers import CommentSerializer, CommentModerationSerializer
+from post.existence import existence_since, post_exists, post_has_comments
 from post.models import Post
 from user.mixins import AuthenticatedCreateViewMixin
-from user.authentication import TokenAuthentication
-from comment.filters import CommentFilter
+from user.authentication import SignedTokenAuthentication, TokenAuthentication
+from user.permissions import IsAdmin
+from comment.filters import CommentFilter, CommentModerationFilter
+from search.filters import FullTextSearchFilter
 from utils.utils import Utils, CustomPagination
+from utils.viewmixins import CursorPaginationMixin, EagerLoadingMixin, ResponseCacheMixin, ConditionalGetMixin, \
+	SparseFieldsMixin, StreamingExportMixin, FragmentCacheMixin
 
 
-class CommentListView(generics.ListCreateAPIView):
-
-	authentication_classes = (TokenAuthentication,)
-	filter_backends = (DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter)
+class CommentListView(ResponseCacheMixin, FragmentCacheMixin, ConditionalGetMixin, CursorPaginationMixin,
+                      SparseFieldsMixin, EagerLoadingMixin, generics.ListCreateAPIView):
+	"""
+	Lists (GET) or creates (POST) the comments of a post
+	---
+	parameters:
+		- name: desc__icontains
+		  description: comments containing all of these words (whole words, not substrings - 'cat' doesn't match
+		    'category'), words shorter than the search index keeps are ignored
+		  type: string
+		  paramType: query
+	"""
+	authentication_classes = (SignedTokenAuthentication, TokenAuthentication)
+	filter_backends = (DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter)
 	filter_class = CommentFilter
 	search_fields = ('desc',)
 	ordering_fields = ('id', 'created_on', 'updated_on')
 	ordering = '-id'
 	pagination_class = CustomPagination
+	queryset = Comment.objects.all()
+	serializer_class = CommentSerializer
+	query_budget = 4
+	version_fields = ('reply_count',)
+	fragment_data_versions = ('authors',)
 
 	def get_queryset(self):
-		try:
-			Post.objects.get(id=self.kwargs['pk'])
-		except Exception as e:
+		# The post's existence is only looked up when the comments can't tell, see paginate_queryset()
+		return super().get_queryset().filter(post=self.kwargs['pk'])
+
+	def paginate_queryset(self, queryset):
+		since = existence_since()
+		page = super().paginate_queryset(queryset)
+		if page:
+			post_has_comments(self.kwargs['pk'], since)
+		elif not post_exists(self.kwargs['pk']):
 			raise Http404
-		return Comment.objects.filter(post=self.kwargs['pk'])
+		return page
+
+	def get_data_versions(self):
+		return 'post:{0}'.format(int(self.kwargs['pk'])), 'authors'
 
 	def perform_create(self, serializer):
+		if not post_exists(self.kwargs['pk']):
+			raise Http404
+
 		serializer.validated_data['post_id'] = self.kwargs['pk']
-		serializer.save()
+		try:
+			with transaction.atomic():
+				serializer.save()
+		except IntegrityError:
+			# deleted since
+			if Post.objects.filter(pk=self.kwargs['pk']).exists():
+				raise
+			raise Http404
+
+	def get_serializer_depth(self):
+		depth = Utils.query_param_int(self.request, 'depth', 0) or 0
+		return min(depth, CommentSerializer.max_depth)
 
 	def get_serializer(self, *args, **kwargs):
 		# Set the depth for serializer if requested
@@ -40,12 +90,143 @@ class CommentListView(generics.ListCreateAPIView):
 		if depth is not None:
 			kwargs['depth'] = depth
 
-		serializer = CommentSerializer(*args, **kwargs)
+		serializer = super().get_serializer(*args, **kwargs)
 		user = self.request.user
 		serializer.auth_user = user
 		return serializer
 
 
-class CommentDetailView(AuthenticatedCreateViewMixin, generics.RetrieveUpdateDestroyAPIView):
+class CommentDetailView(ConditionalGetMixin, SparseFieldsMixin, EagerLoadingMixin, AuthenticatedCreateViewMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
+	queryset = Comment.objects.all()
+	serializer_class = CommentSerializer
+	query_budget = 4
+	version_fields = ('reply_count',)
+
+	def get_data_versions(self):
+		return 'authors',
+
+
+class CommentExportView(StreamingExportMixin, EagerLoadingMixin, generics.GenericAPIView):
+	"""
+	Streams all the comments of a post matching the CommentFilter params, see StreamingExportMixin
+	"""
+	authentication_classes = (SignedTokenAuthentication, TokenAuthentication)
+	permission_classes = (IsAuthenticated,)
+	filter_backends = (DjangoFilterBackend,)
+	filter_class = CommentFilter
 	queryset = Comment.objects.all()
 	serializer_class = CommentSerializer
+	query_budget = 2
+
+	def get_export_queryset(self):
+		if not post_exists(self.kwargs['pk']):
+			raise Http404
+		return super().get_export_queryset().filter(post=self.kwargs['pk'])
+
+
+class CommentTreeView(generics.GenericAPIView):
+	"""
+	Returns the whole comment thread of a post, replies nested under their comment, read with a single range query
+	over the comments' materialized path
+	---
+	parameters:
+		- name: max_depth
+		  description: deepest reply level to include, 0 for top level comments only
+		  type: integer
+		  paramType: query
+		- name: limit
+		  description: max no. of comments to include per level i.e. top level comments and replies to each comment
+		  type: integer
+		  paramType: query
+	"""
+	authentication_classes = (SignedTokenAuthentication, TokenAuthentication)
+	queryset = Comment.objects.all()
+	serializer_class = CommentSerializer
+	query_budget = 3
+
+	def get_queryset(self):
+		related, only = CommentSerializer.get_eager_loading_fields()
+		queryset = super().get_queryset().filter(post=self.kwargs['pk'])
+		return queryset.select_related(*related).only(*(only | {'path', 'depth'})).order_by('path')
+
+	def get(self, request, *args, **kwargs):
+		max_depth = Utils.query_param_int(request, 'max_depth', 0, Comment.MAX_DEPTH)
+		limit = Utils.query_param_int(request, 'limit', 1)
+
+		queryset = self.get_queryset()
+		if max_depth is not None:
+			queryset = queryset.filter(depth__lte=max_depth)
+
+		since = existence_since()
+		comments = list(queryset)
+		if comments:
+			post_has_comments(self.kwargs['pk'], since)
+		elif not post_exists(self.kwargs['pk']):
+			raise Http404
+
+		# path order means a comment always comes after its parent, so a single pass can apply the per level limit
+		# (and drop the replies of the comments that got cut)
+		kept, kept_paths, replies = [], set(), defaultdict(int)
+		for comment in comments:
+			parent_path = comment.path[:-Comment.PATH_STEP]
+			if parent_path and parent_path not in kept_paths:
+				continue
+			if limit is not None and replies[parent_path] >= limit:
+				continue
+			replies[parent_path] += 1
+			kept_paths.add(comment.path)
+			kept.append(comment)
+
+		nodes, roots = {}, []
+		for comment, data in zip(kept, self.get_serializer(kept, many=True).data):
+			data['replies'] = []
+			nodes[comment.path] = data
+			parent = nodes.get(comment.path[:-Comment.PATH_STEP])
+			(parent['replies'] if parent else roots).append(data)
+
+		return Response({'count': len(kept), 'results': roots})
+
+
+class CommentModerationView(generics.GenericAPIView):
+	"""
+	Approves or rejects comments in bulk (admin only), with a single UPDATE. Comments are picked by the 'ids' in the
+	body and/or by the query params of CommentModerationFilter (post, user_ids, created_on__gte etc.)
+	---
+	parameters:
+		- name: approved_comment
+		  description: true to approve, false to reject
+		  type: boolean
+		  paramType: form
+		- name: ids
+		  description: comment ids
+		  type: array
+		  paramType: form
+	"""
+	authentication_classes = (SignedTokenAuthentication, TokenAuthentication)
+	permission_classes = (IsAdmin,)
+	filter_backends = (DjangoFilterBackend,)
+	filter_class = CommentModerationFilter
+	queryset = Comment.objects.all()
+	serializer_class = CommentModerationSerializer
+
+	def post(self, request, *args, **kwargs):
+		serializer = self.get_serializer(data=request.data)
+		serializer.is_valid(raise_exception=True)
+
+		ids = serializer.validated_data.get('ids')
+		unfiltered = self.get_queryset()
+		queryset = self.filter_queryset(unfiltered)
+		# a filter given a value and applied: an empty param filters nothing (e.g. '?post=') or, worse, something
+		# else (a boolean filter takes '' for False)
+		filtered = (any(request.query_params.get(name) for name in self.filter_class.base_filters) and
+		            len(queryset.query.where.children) > len(unfiltered.query.where.children))
+		if not ids and not filtered:
+			# never moderate the whole table by accident
+			raise exceptions.ValidationError({'ids': [_('either ids or a filter is required')]})
+
+		if ids:
+			queryset = queryset.filter(pk__in=ids)
+
+		updated = moderate_comments(queryset, serializer.validated_data['approved_comment'])
+		return Response({'updated': updated})
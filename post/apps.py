@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class PostConfig(AppConfig):
     name = 'post'
+
+    def ready(self):
+        # connects the timeline fan-out and known post id receivers
+        import post.timeline
+        import post.existence
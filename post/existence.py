@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from post.models import Post
+
+
+class KnownPosts:
+	"""
+	Process local LRU set of the ids of posts known to exist, so that the comment views don't need a query just to
+	tell a missing post (404) from one without comments. Only existence is cached (a missing id is always looked up,
+	the post may be created any moment) and entries live at most 'ttl' seconds.
+
+	Ids are dropped on post delete (see below) - but only in this process, other processes can take a deleted post for
+	an existing one (without comments) for up to 'ttl' seconds
+	"""
+
+	def __init__(self, max_size=10000, ttl=60):
+		self.max_size = max_size
+		self.ttl = ttl
+		self._ids = OrderedDict()  # post id vs. expires at
+		self._lock = threading.Lock()
+		self.hits = self.misses = 0
+		self.invalidations = 0
+
+	def exists(self, post_id):
+		"""
+		:return: True if the post exists, from the cache or from the DB
+		"""
+		post_id = int(post_id)
+		with self._lock:
+			expires_at = self._ids.get(post_id)
+			if expires_at is not None and expires_at > time.monotonic():
+				self._ids.move_to_end(post_id)
+				self.hits += 1
+				return True
+			self.misses += 1
+			since = self.invalidations
+
+		exists = Post.objects.filter(pk=post_id).exists()
+		if exists:
+			self.add(post_id, since=since)
+		return exists
+
+	def add(self, post_id, since=None):
+		"""
+		:param since: value of 'invalidations' from before the post was found to exist, it isn't added if anything got
+		  invalidated since then (it may have been deleted just after)
+		"""
+		with self._lock:
+			if since is not None and since != self.invalidations:
+				return
+			self._ids.pop(int(post_id), None)
+			self._ids[int(post_id)] = time.monotonic() + self.ttl
+			while len(self._ids) > self.max_size:
+				self._ids.popitem(last=False)
+
+	def discard(self, post_id):
+		with self._lock:
+			self.invalidations += 1
+			self._ids.pop(int(post_id), None)
+
+	def clear(self):
+		with self._lock:
+			self.invalidations += 1
+			self._ids.clear()
+
+	def stats(self):
+		return {'size': len(self._ids), 'hits': self.hits, 'misses': self.misses}
+
+
+def _create_known_posts():
+	config = getattr(settings, 'KNOWN_POSTS', {})
+	if not config.get('ENABLED', True):
+		return None
+	return KnownPosts(max_size=config.get('MAX_SIZE', 10000), ttl=config.get('TTL', 60))
+
+
+known_posts = _create_known_posts()
+
+
+def post_exists(post_id):
+	if known_posts:
+		return known_posts.exists(post_id)
+	return Post.objects.filter(pk=post_id).exists()
+
+
+def existence_since():
+	"""
+	:return: the value to pass post_has_comments() as 'since', read before the comments are
+	"""
+	return known_posts.invalidations if known_posts else None
+
+
+def post_has_comments(post_id, since):
+	"""
+	Call when comments of the post were just read, it exists then - unless it was deleted since 'since' (see
+	existence_since()), the comments may have been read just before the delete committed
+	"""
+	if known_posts:
+		known_posts.add(post_id, since=since)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='post.existence.forget_deleted_post')
+def forget_deleted_post(sender, instance, **kwargs):
+	# now and again once committed, so that a concurrent request can't add it back in between
+	if known_posts:
+		known_posts.discard(instance.pk)
+		transaction.on_commit(lambda: known_posts.discard(instance.pk))
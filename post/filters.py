@@ -2,12 +2,14 @@ import rest_framework_filters as filters
 
 from utils.utils import Utils
 from utils.filters import add_date_filtering
+from search.filters import FullTextFilter
 from post.models import Post
 
 
 class PostFilter(filters.FilterSet):
-	title__icontains = filters.CharFilter(name='title', lookup_type='icontains')
-	desc__icontains = filters.CharFilter(name='desc', lookup_type='icontains')
+	# kept the old names for clients, these are whole word (full-text) matches now, not substring ones
+	title__icontains = FullTextFilter(name='title')
+	desc__icontains = FullTextFilter(name='desc')
 	user_ids = filters.MethodFilter(action='userid_filter')
 
 	def userid_filter(self, name, queryset, value):
@@ -23,6 +25,7 @@ class PostFilter(filters.FilterSet):
 		model = Post
 		fields = ('title', 'desc')
 		date_fields = ('created_on', 'updated_on')
+		date_range_fields = ('created_on', 'updated_on')
 
 
 add_date_filtering(PostFilter)
@@ -0,0 +1,199 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, models, transaction
+from django.db.models import Count
+
+from comment.filters import CommentFilter, CommentModerationFilter
+from comment.models import Comment
+from post.filters import PostFilter
+from post.models import Post
+
+BENCH_DB = 'bench_query_plans'
+
+
+def _sqlite_type(field):
+	if isinstance(field, (models.AutoField, models.IntegerField, models.BooleanField, models.ForeignKey)):
+		return 'integer'
+	return 'text'
+
+
+def _create_table(db, model):
+	columns = ', '.join(
+		'"{0}" {1}{2}'.format(field.column, _sqlite_type(field), ' primary key' if field.primary_key else '')
+		for field in model._meta.local_fields)
+	db.execute('create table "{0}" ({1})'.format(model._meta.db_table, columns))
+
+
+def _sql(queryset, count=False):
+	"""
+	:return: (sql, params) the ORM runs for 'queryset', or for its count() (built the way Query.get_count() does)
+	"""
+	query = queryset.query.clone()
+	if count:
+		query.add_annotation(Count('*'), alias='__count', is_summary=True)
+		query.select = []
+		query.default_cols = False
+		query.clear_ordering(True)
+		query.clear_limits()
+	return query.get_compiler(queryset.db).as_sql()
+
+
+def _indexes(model, fk_only=False):
+	"""
+	:return: column lists of the indexes django creates for 'model', only the FK ones if 'fk_only'
+	"""
+	indexes = [[field.column] for field in model._meta.local_fields
+	           if field.db_index and not field.primary_key and (field.is_relation or not fk_only)]
+	if not fk_only:
+		indexes += [[model._meta.get_field(name).column for name in fields] for fields in model._meta.index_together]
+	return indexes
+
+
+def _create_indexes(db, model, fk_only=False):
+	table = model._meta.db_table
+	for columns in _indexes(model, fk_only):
+		db.execute('create index if not exists "{0}" on "{1}" ({2})'.format(
+			'bench_{0}_{1}'.format(table, '_'.join(columns)), table, ', '.join('"%s"' % column for column in columns)))
+	db.execute('analyze')
+
+
+class Command(BaseCommand):
+	help = ('Seeds a scratch SQLite database with posts/comments and reports the query plan and timings of the list and '
+	        'filter queries of the API, first with the FK indexes only and then with all the indexes the models declare')
+
+	def add_arguments(self, parser):
+		parser.add_argument('--posts', type=int, default=20000)
+		parser.add_argument('--comments', type=int, default=200000)
+		parser.add_argument('--users', type=int, default=1000)
+		parser.add_argument('--repeat', type=int, default=50, help='runs of each query, median time is reported')
+		parser.add_argument('--seed', type=int, default=1)
+		parser.add_argument('--output', help='also write the report to this file')
+
+	def queries(self, options):
+		"""
+		:return: [(label, queryset factory, count)], the querysets built as the API's list/filter views build them - the
+		  filter classes and ordering of the views, limited to a page of 20 - 'count' for the paginator's count query
+		"""
+		posts, users = options['posts'], options['users']
+		start = self.start
+		post_queryset, comment_queryset = Post.objects.using(BENCH_DB), Comment.objects.using(BENCH_DB)
+
+		def day(rng):
+			return (start + timedelta(minutes=rng.randrange(posts))).date().isoformat()
+
+		return [
+			('comment list of a post',
+			 lambda rng: comment_queryset.filter(post=rng.randint(1, posts)).order_by('-id')[:20],
+			 False),
+			('posts of users',
+			 lambda rng: PostFilter({'user_ids': ','.join(str(pk) for pk in rng.sample(range(1, users + 1), 3))},
+			                        queryset=post_queryset).qs.order_by('-id')[:20],
+			 False),
+			('posts created on a day, count',
+			 lambda rng: PostFilter({'created_on': day(rng)}, queryset=post_queryset).qs,
+			 True),
+			('comments updated on a day, count',
+			 lambda rng: CommentFilter({'updated_on': day(rng)}, queryset=comment_queryset).qs,
+			 True),
+			('approved comments of a post',
+			 lambda rng: CommentFilter({'approved_comment': 'true'},
+			                           queryset=comment_queryset.filter(post=rng.randint(1, posts))).qs.order_by('-id')[:20],
+			 False),
+			('moderation queue',
+			 lambda rng: CommentModerationFilter({'approved_comment': 'false'}, queryset=comment_queryset).qs.order_by(
+				 '-id')[:20],
+			 False),
+		]
+
+	def seed(self, db, options):
+		rng = random.Random(options['seed'])
+		posts, comments, users = options['posts'], options['comments'], options['users']
+
+		def comment(i):
+			minute = i * posts // comments
+			return (i, rng.randint(1, minute or 1), rng.randint(1, users), 'desc', self.at(minute), self.at(minute),
+			        None, int(rng.random() > 0.02), 0, '', 0)
+
+		# a post a minute, comments spread over the posts before them
+		with transaction.atomic(using=BENCH_DB):
+			db.executemany(
+				'insert into "{0}" (id, user_id, title, "desc", created_on, updated_on, comment_count) '
+				'values (%s, %s, %s, %s, %s, %s, 0)'.format(Post._meta.db_table),
+				((i, rng.randint(1, users), 'title', 'desc', self.at(i), self.at(i)) for i in range(1, posts + 1)))
+			db.executemany(
+				'insert into "{0}" (id, post_id, user_id, "desc", created_on, updated_on, comment_id, approved_comment, '
+				'reply_count, path, depth) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'.format(
+					Comment._meta.db_table),
+				(comment(i) for i in range(1, comments + 1)))
+
+	def at(self, minute):
+		return (self.start + timedelta(minutes=minute)).isoformat(' ')
+
+	def run(self, db, queries, options):
+		results = []
+		for label, queryset, count in queries:
+			rng = random.Random(options['seed'])
+			sql, params = _sql(queryset(rng), count)
+			db.execute('explain query plan ' + sql, params)
+			plan = '; '.join(row[-1] for row in db.fetchall())
+
+			timings = []
+			for i in range(options['repeat']):
+				sql, params = _sql(queryset(rng), count)
+				start = time.perf_counter()
+				db.execute(sql, params)
+				db.fetchall()
+				timings.append((time.perf_counter() - start) * 1000)
+			results.append((label, plan, statistics.median(timings)))
+		return results
+
+	def handle(self, *args, **options):
+		self.start = datetime(2016, 1, 1)
+		queries = self.queries(options)
+
+		fd, path = tempfile.mkstemp(suffix='.sqlite3')
+		os.close(fd)
+		# a connection of its own, so that the querysets are compiled and run by Django as they are for the API
+		connections.databases[BENCH_DB] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+		try:
+			db = connections[BENCH_DB].cursor()
+			for model in (Post, Comment):
+				_create_table(db, model)
+			self.seed(db, options)
+
+			for model in (Post, Comment):
+				_create_indexes(db, model, fk_only=True)
+			before = self.run(db, queries, options)
+
+			for model in (Post, Comment):
+				_create_indexes(db, model)
+			after = self.run(db, queries, options)
+			db.close()
+		finally:
+			connections[BENCH_DB].close()
+			del connections[BENCH_DB]
+			del connections.databases[BENCH_DB]
+			os.remove(path)
+
+		lines = ['sqlite {0}, {1} posts, {2} comments, {3} users, median of {4} runs'.format(
+			sqlite3.sqlite_version, options['posts'], options['comments'], options['users'], options['repeat'])]
+		for (label, plan_before, ms_before), (label, plan_after, ms_after) in zip(before, after):
+			lines += [
+				'',
+				'{0}: {1:.3f}ms -> {2:.3f}ms'.format(label, ms_before, ms_after),
+				'  before: ' + plan_before,
+				'  after:  ' + plan_after,
+			]
+		report = '\n'.join(lines)
+
+		self.stdout.write(report)
+		if options['output']:
+			with open(options['output'], 'w') as f:
+				f.write(report + '\n')
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+# The schema from before the app had migrations, a database created by syncdb then takes it with
+# 'manage.py migrate --fake-initial'
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+	initial = True
+
+	dependencies = [
+		migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name='Post',
+			fields=[
+				('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('title', models.CharField(max_length=500)),
+				('desc', models.CharField(max_length=10000)),
+				('created_on', models.DateTimeField()),
+				('updated_on', models.DateTimeField()),
+				('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='post_user', to=settings.AUTH_USER_MODEL)),
+			],
+			options={
+				'abstract': False,
+			},
+		),
+	]
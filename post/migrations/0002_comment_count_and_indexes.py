@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+	dependencies = [
+		('post', '0001_initial'),
+	]
+
+	operations = [
+		migrations.AddField(
+			model_name='post',
+			name='comment_count',
+			field=models.PositiveIntegerField(default=0),
+		),
+		migrations.AlterField(
+			model_name='post',
+			name='created_on',
+			field=models.DateTimeField(db_index=True),
+		),
+		migrations.AlterField(
+			model_name='post',
+			name='updated_on',
+			field=models.DateTimeField(db_index=True),
+		),
+		migrations.AlterIndexTogether(
+			name='post',
+			index_together=set([('user', 'id')]),
+		),
+	]
@@ -1,21 +1,38 @@
 from django.db import models
 from django.utils import timezone
 
+from search.mixins import SearchIndexMixin
+from utils.cache import CacheVersionedMixin
 from utils.models import BlankModel
 from django.conf import settings
 
 
 # Create your models here.
 
-class Post(BlankModel):
+class Post(CacheVersionedMixin, SearchIndexMixin, BlankModel):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='post_user', null=True, on_delete=models.SET_NULL)
 	title = models.CharField(max_length=500)
 	desc = models.CharField(max_length=10000)
-	created_on = models.DateTimeField()
-	updated_on = models.DateTimeField()
+	created_on = models.DateTimeField(db_index=True)
+	updated_on = models.DateTimeField(db_index=True)
+	comment_count = models.PositiveIntegerField(default=0)  # approved comments, maintained in comment.models
 
-	def save(self, *args, **kwargs):
+	search_index_fields = (('title', 2.0), ('desc', 1.0))
+
+	class Meta:
+		index_together = (
+			('user', 'id'),  # posts of users, newest first
+		)
+
+	def set_timestamps(self, now=None):
+		now = now or timezone.now()
 		if not self.id:
-			self.created_on = timezone.now()
-		self.updated_on = timezone.now()
+			self.created_on = now
+		self.updated_on = now
+
+	def save(self, *args, **kwargs):
+		self.set_timestamps()
 		return super(Post, self).save(*args, **kwargs)
+
+	def get_cache_versions(self):
+		return 'posts', 'post:{0}'.format(self.pk)
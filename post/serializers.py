@@ -2,12 +2,17 @@ from rest_framework import serializers
 
 from post.models import Post
 from user.mixins import AuthenticatedSerializerMixin
+from utils.serializers import EagerLoadingSerializerMixin, SparseFieldsSerializerMixin
 
 
-class PostSerializer(AuthenticatedSerializerMixin, serializers.ModelSerializer):
+class PostSerializer(SparseFieldsSerializerMixin, EagerLoadingSerializerMixin, AuthenticatedSerializerMixin, serializers.ModelSerializer):
 
 	author = serializers.SerializerMethodField()
 
+	field_sources = {
+		'author': ('user__first_name', 'user__last_name'),
+	}
+
 	def get_author(self, obj):
 		if obj.user:
 			return obj.user.get_author()
@@ -15,5 +20,5 @@ class PostSerializer(AuthenticatedSerializerMixin, serializers.ModelSerializer):
 
 	class Meta:
 		model = Post
-		fields = ('id', 'title', 'author', 'desc', 'created_on', 'updated_on')
-		read_only_fields = ('created_on', 'updated_on')
+		fields = ('id', 'title', 'author', 'desc', 'created_on', 'updated_on', 'comment_count')
+		read_only_fields = ('created_on', 'updated_on', 'comment_count')
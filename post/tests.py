@@ -1,3 +1,224 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from comment.models import Comment
+from post.models import Post
+from post.views import PostListView, PostDetailView, PostExportView
+from user.models import Token
+from utils.cache import CacheVersions, get_cache
+from utils.querybudget import query_budget
+
+
+def create_user(name):
+	user = get_user_model().objects.create_user(username=name, email=name + '@example.com', password='password123',
+	                                            first_name=name, last_name='Test')
+	return user, Token.objects.create(user=user, client_token=name)
+
+
+class PostTestMixin(object):
+	def setUp(self):
+		get_cache().clear()
+		self.user, self.token = create_user('author')
+		self.posts = [Post.objects.create(user=self.user, title='title %d' % i, desc='desc %d' % i) for i in range(6)]
+		for post in self.posts[:3]:
+			Comment.objects.create(post=post, user=self.user, desc='comment')
+
+	def authenticate(self, token=None):
+		self.client.credentials(HTTP_AUTHORIZATION='Token ' + (token or self.token).key)
+
+	def get_results(self, url, **params):
+		"""
+		:return: 'results' of a list response, parsed from its content (the renderer splices cached fragments in)
+		"""
+		response = self.client.get(url, params)
+		self.assertEqual(response.status_code, 200)
+		return json.loads(response.content.decode('utf-8'))['results']
+
+
+class PostReadTests(PostTestMixin, APITestCase):
+	def test_list_query_budget(self):
+		with query_budget(PostListView.query_budget, 'post-list'):
+			results = self.get_results(reverse('post-list'), **{'page-size': 100})
+		self.assertEqual([post['id'] for post in results], [post.pk for post in reversed(self.posts)])
+
+	def test_list_query_budget_authenticated(self):
+		self.authenticate()
+		with query_budget(PostListView.query_budget, 'post-list'):
+			self.get_results(reverse('post-list'), **{'page-size': 100})
+
+	def test_detail_query_budget(self):
+		post = self.posts[0]
+		with query_budget(PostDetailView.query_budget, 'post-detail'):
+			response = self.client.get(reverse('post-detail', kwargs={'pk': post.pk}))
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['title'], post.title)
+		self.assertEqual(response.data['comment_count'], 1)
+
+	def test_sparse_fields(self):
+		results = self.get_results(reverse('post-list'), fields='title,id,title')
+		self.assertEqual(set(results[0]), {'id', 'title'})
+
+		response = self.client.get(reverse('post-list'), {'fields': 'id,nope'})
+		self.assertEqual(response.status_code, 400)
+
+
+class PostCacheInvalidationTests(PostTestMixin, APITransactionTestCase):
+	"""
+	Cache versions are bumped once the write commits, hence transaction test cases
+	"""
+
+	def test_edit_shows_in_cached_list(self):
+		post = self.posts[-1]
+		self.assertEqual(self.get_results(reverse('post-list'))[0]['title'], post.title)
+
+		self.authenticate()
+		response = self.client.patch(reverse('post-detail', kwargs={'pk': post.pk}), {'title': 'edited'}, format='json')
+		self.assertEqual(response.status_code, 200)
+
+		self.client.credentials()
+		self.assertEqual(self.get_results(reverse('post-list'))[0]['title'], 'edited')
+
+	def test_new_comment_shows_in_cached_list(self):
+		post = self.posts[-1]
+		self.assertEqual(self.get_results(reverse('post-list'))[0]['comment_count'], 0)
+
+		self.authenticate()
+		response = self.client.post(reverse('comment-list', kwargs={'pk': post.pk}), {'desc': 'new'}, format='json')
+		self.assertEqual(response.status_code, 201)
+
+		self.client.credentials()
+		self.assertEqual(self.get_results(reverse('post-list'))[0]['comment_count'], 1)
+
+	def test_comment_edit_keeps_post_lists(self):
+		comment = Comment.objects.filter(post=self.posts[0]).first()
+		posts_version, post_version = CacheVersions.get_many(['posts', 'post:{0}'.format(comment.post_id)])
+
+		comment.desc = 'edited'
+		comment.save()
+		self.assertEqual(CacheVersions.get_many(['posts', 'post:{0}'.format(comment.post_id)]),
+		                 [posts_version, post_version + 1])
+
+		comment.delete()
+		self.assertEqual(CacheVersions.get_many(['posts'])[0], posts_version + 1)
+
+
+class PostConditionalGetTests(PostTestMixin, APITransactionTestCase):
+	def revalidate(self, url, response):
+		"""
+		:return: status codes of revalidating 'response' with its ETag and, separately, with its Last-Modified
+		"""
+		return (self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+		        self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code)
+
+	def test_list_row_deleted(self):
+		url = reverse('post-list')
+		response = self.client.get(url)
+		self.assertEqual(self.revalidate(url, response), (304, 200))
+
+		self.posts[2].delete()  # not the newest, the page's Last-Modified stays the same
+		self.assertEqual(self.revalidate(url, response), (200, 200))
+
+	def test_list_counter_changed(self):
+		url = reverse('post-list')
+		response = self.client.get(url)
+
+		Comment.objects.create(post=self.posts[-1], user=self.user, desc='comment')
+		self.assertEqual(self.revalidate(url, response), (200, 200))
+
+	def test_detail_counter_changed(self):
+		url = reverse('post-detail', kwargs={'pk': self.posts[0].pk})
+		response = self.client.get(url)
+		self.assertEqual(self.revalidate(url, response), (304, 200))
+
+		Comment.objects.create(post=self.posts[0], user=self.user, desc='comment')
+		self.assertEqual(self.revalidate(url, response), (200, 200))
+
+
+class PostBulkTests(PostTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.authenticate()
+
+	def test_create(self):
+		items = [{'title': 'bulk %d' % i, 'desc': 'desc'} for i in range(3)] + [{'title': ''}, 'not a post']
+		response = self.client.post(reverse('post-bulk'), items, format='json')
+		self.assertEqual(response.status_code, 201)
+
+		results = response.data['results']
+		self.assertEqual([result['index'] for result in results], [0, 1, 2])
+		for result in results:
+			post = Post.objects.get(pk=result['id'])
+			self.assertEqual((post.title, post.user_id), ('bulk %d' % result['index'], self.user.pk))
+		self.assertEqual([error['index'] for error in response.data['errors']], [3, 4])
+
+	def test_create_with_unknown_pks(self):
+		# another post of the user created at the very same time, the new pks can't be told from created_on
+		now = timezone.now()
+		Post.objects.filter(pk=self.posts[0].pk).update(created_on=now)
+		with mock.patch('post.views.timezone.now', return_value=now):
+			response = self.client.post(reverse('post-bulk'), [{'title': 'bulk %d' % i, 'desc': 'desc'}
+			                                                   for i in range(3)], format='json')
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual([Post.objects.get(pk=result['id']).title for result in response.data['results']],
+		                 ['bulk 0', 'bulk 1', 'bulk 2'])
+
+	def test_update(self):
+		other, other_token = create_user('other')
+		others_post = Post.objects.create(user=other, title='other', desc='desc')
+		items = [{'id': self.posts[0].pk, 'title': 'edited'}, {'id': self.posts[1].pk, 'desc': 'edited'},
+		         {'id': others_post.pk, 'title': 'edited'}, {'title': 'no id'}]
+		response = self.client.patch(reverse('post-bulk'), items, format='json')
+		self.assertEqual(response.status_code, 200)
+
+		self.assertEqual([result['index'] for result in response.data['results']], [0, 1])
+		self.assertEqual([error['index'] for error in response.data['errors']], [2, 3])
+		self.assertEqual(Post.objects.get(pk=self.posts[0].pk).title, 'edited')
+		self.assertEqual(Post.objects.get(pk=self.posts[1].pk).desc, 'edited')
+		self.assertEqual(Post.objects.get(pk=others_post.pk).title, 'other')
+
+
+class PostExportTests(PostTestMixin, APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.authenticate()
+
+	def export(self, **params):
+		"""
+		:return: the exported rows, as JSON and as NDJSON - read 4 at a time, more than one batch
+		"""
+		exports = []
+		for format in ('json', 'ndjson'):
+			with mock.patch.object(PostExportView, 'export_batch_size', 4):
+				response = self.client.get(reverse('post-export'), dict(params, format=format))
+			self.assertEqual(response.status_code, 200)
+			content = b''.join(response.streaming_content).decode('utf-8')
+			if format == 'json':
+				self.assertTrue(response['Content-Type'].startswith('application/json'))
+				exports.append(json.loads(content))
+			else:
+				self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+				exports.append([json.loads(line) for line in content.splitlines()])
+		self.assertEqual(exports[0], exports[1])
+		return exports[0]
+
+	def test_export(self):
+		rows = self.export()
+		self.assertEqual([row['id'] for row in rows], [post.pk for post in self.posts])
+		self.assertEqual(rows[0]['title'], self.posts[0].title)
+		self.assertNotIn('comments', rows[0])
+
+	def test_filters(self):
+		self.assertEqual([row['id'] for row in self.export(title='title 1')], [self.posts[1].pk])
+
+		rows = self.export(comments=1, **{'comment-desc': 'comment'})
+		self.assertEqual([len(row['comments']) for row in rows], [1, 1, 1, 0, 0, 0])
+		rows = self.export(comments=1, **{'comment-desc': 'other'})
+		self.assertEqual([row['comments'] for row in rows], [[]] * 6)
+
+	def test_empty(self):
+		self.assertEqual(self.export(title='none'), [])
@@ -0,0 +1,128 @@
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from post.models import Post
+from user.models import Follow
+from utils.cache import get_cache
+
+
+class TimelineStore(object):
+	"""
+	Home timelines, per user the ids of the latest posts (newest first, at most 'max_length') of the authors they
+	follow, kept in the cache.
+
+	A new post is fanned out on write, its id pushed to the timelines of its author's followers - only to those
+	timelines that are in the cache, a missing one (never read, evicted, or dropped on a follow/unfollow) is rebuilt
+	from the posts with a single query on its next read. Posts of authors with more than 'fan_out_limit' followers are
+	not fanned out, they are merged in when a timeline is read instead (fan-out on read).
+
+	A push is a read-modify-write of the cached lists, a post fanned out to the same follower at the very same moment
+	as another one can be lost from that timeline until it is rebuilt
+	"""
+	prefix = 'timeline:'
+
+	def __init__(self, max_length=800, fan_out_limit=10000, batch_size=1000, timeout=86400):
+		self.max_length = max_length
+		self.fan_out_limit = fan_out_limit
+		self.batch_size = batch_size
+		self.timeout = timeout
+
+	def _key(self, user_id):
+		return self.prefix + str(user_id)
+
+	def build(self, user_id, before=None, limit=None):
+		"""
+		:return: ids of the latest posts of the fanned out authors 'user_id' follows, older than 'before' if given
+		"""
+		queryset = Post.objects.filter(user__in=Follow.objects.filter(
+			follower=user_id, followee__follower_count__lte=self.fan_out_limit).values('followee'))
+		if before is not None:
+			queryset = queryset.filter(pk__lt=before)
+		return list(queryset.order_by('-id').values_list('id', flat=True)[:limit or self.max_length])
+
+	def get(self, user_id):
+		cache = get_cache()
+		ids = cache.get(self._key(user_id))
+		if ids is None:
+			ids = self.build(user_id)
+			cache.set(self._key(user_id), ids, self.timeout)
+		return ids
+
+	def drop(self, *user_ids):
+		get_cache().delete_many([self._key(user_id) for user_id in user_ids])
+
+	def push(self, author_id, *post_ids):
+		"""
+		Fans out new posts of 'author_id', unless they have too many followers
+		"""
+		follower_count = get_user_model().objects.filter(pk=author_id).values_list('follower_count', flat=True).first()
+		if not follower_count or follower_count > self.fan_out_limit:
+			return
+
+		cache = get_cache()
+		followers = Follow.objects.filter(followee=author_id).values_list('follower', flat=True).iterator()
+		while True:
+			batch = list(islice(followers, self.batch_size))
+			if not batch:
+				return
+
+			timelines = cache.get_many([self._key(user_id) for user_id in batch])
+			for key, ids in timelines.items():
+				timelines[key] = sorted(set(ids).union(post_ids), reverse=True)[:self.max_length]
+			if timelines:
+				cache.set_many(timelines, self.timeout)
+
+	def page(self, user_id, before=None, limit=20):
+		"""
+		:return: ids of the 'limit' latest posts in the timeline of 'user_id', older than post id 'before' if given
+		"""
+		ids = self.get(user_id)
+		page = [post_id for post_id in ids if before is None or post_id < before][:limit]
+		if len(page) < limit and len(ids) >= self.max_length:
+			# past the end of what is kept, read on from the posts themselves
+			page += self.build(user_id, before=page[-1] if page else before, limit=limit - len(page))
+
+		# fan-out on read for the authors with too many followers
+		merged = Follow.objects.filter(follower=user_id, followee__follower_count__gt=self.fan_out_limit)
+		merged = list(merged.values_list('followee', flat=True))
+		if merged:
+			queryset = Post.objects.filter(user__in=merged)
+			if before is not None:
+				queryset = queryset.filter(pk__lt=before)
+			page = sorted(set(page).union(queryset.order_by('-id').values_list('id', flat=True)[:limit]),
+			              reverse=True)[:limit]
+		return page
+
+
+def _create_store():
+	config = getattr(settings, 'TIMELINE', {})
+	return TimelineStore(max_length=config.get('MAX_LENGTH', 800), fan_out_limit=config.get('FAN_OUT_LIMIT', 10000),
+	                     batch_size=config.get('BATCH_SIZE', 1000), timeout=config.get('TIMEOUT', 86400))
+
+
+timeline_store = _create_store()
+
+
+def fan_out_on_commit(author_id, *post_ids):
+	if author_id is not None and post_ids:
+		transaction.on_commit(lambda: timeline_store.push(author_id, *post_ids))
+
+
+# bulk created posts are fanned out by post.views.PostBulkView
+
+@receiver(post_save, sender=Post, dispatch_uid='post.timeline.fan_out_post')
+def fan_out_post(sender, instance, created, **kwargs):
+	if created:
+		fan_out_on_commit(instance.user_id, instance.pk)
+
+
+@receiver(post_save, sender=Follow, dispatch_uid='post.timeline.follow_saved')
+@receiver(post_delete, sender=Follow, dispatch_uid='post.timeline.follow_deleted')
+def drop_timeline(sender, instance, **kwargs):
+	# rebuilt on the next read, with (or without) the followee's posts
+	transaction.on_commit(lambda: timeline_store.drop(instance.follower_id))
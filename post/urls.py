@@ -1,9 +1,14 @@
 from django.conf.urls import url, include
 
-from post.views import PostListView, PostDetailView
+from comment.views import CommentModerationView
+from post.views import PostListView, PostDetailView, PostBulkView, PostExportView, TimelineView
 
 urlpatterns = [
 	url(r'^posts/$', PostListView.as_view(), name='post-list'),
+	url(r'^posts/bulk/$', PostBulkView.as_view(), name='post-bulk'),
+	url(r'^posts/export/$', PostExportView.as_view(), name='post-export'),
 	url(r'^posts/(?P<pk>[0-9]+)/$', PostDetailView.as_view(), name='post-detail'),
 	url(r'^posts/(?P<pk>[0-9]+)/comments/', include('comment.urls')),
+	url(r'^timeline/$', TimelineView.as_view(), name='timeline'),
+	url(r'^comments/moderate/$', CommentModerationView.as_view(), name='comment-moderate'),
 ]
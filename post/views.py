@@ -1,16 +1,53 @@
-from rest_framework import filters, exceptions
+from collections import OrderedDict, defaultdict
+from itertools import islice
+
+from django.core import signing
+from django.db import transaction
+from django.db.models import Case, When, Value, F
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import filters, exceptions, status
 from rest_framework_filters.backends import DjangoFilterBackend
 from rest_framework import generics
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
+from comment.filters import CommentFilter
+from comment.models import Comment
+from comment.serializers import CommentSerializer
 from post.models import Post
 from post.filters import PostFilter
 from post.serializers import PostSerializer
-from user.mixins import AuthenticatedCreateViewMixin
-from utils.utils import CustomPagination
+from post.timeline import timeline_store, fan_out_on_commit
+from search.backends import get_search_backend
+from search.filters import FullTextSearchFilter
+from user.mixins import AuthenticatedViewMixin, AuthenticatedCreateViewMixin
+from utils.cache import CacheVersions
+from utils.parsers import NDJSONParser
+from utils.utils import Utils, CustomPagination, CustomCursorPagination
+from utils.viewmixins import CursorPaginationMixin, EagerLoadingMixin, ResponseCacheMixin, ConditionalGetMixin, \
+	SparseFieldsMixin, StreamingExportMixin, FragmentCacheMixin
 
 
-class PostListView(AuthenticatedCreateViewMixin, generics.ListCreateAPIView):
-	filter_backends = (DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter)
+class PostListView(ResponseCacheMixin, FragmentCacheMixin, ConditionalGetMixin, CursorPaginationMixin,
+                   SparseFieldsMixin, EagerLoadingMixin, AuthenticatedCreateViewMixin, generics.ListCreateAPIView):
+	"""
+	Lists (GET) or creates (POST) posts
+	---
+	parameters:
+		- name: title__icontains
+		  description: posts whose title contains all of these words (whole words, not substrings - 'cat' doesn't
+		    match 'category'), words shorter than the search index keeps are ignored
+		  type: string
+		  paramType: query
+		- name: desc__icontains
+		  description: same as title__icontains, on the description
+		  type: string
+		  paramType: query
+	"""
+	filter_backends = (DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter)
 	filter_class = PostFilter
 	search_fields = ('title', 'desc')
 	ordering_fields = ('id', 'created_on', 'updated_on')
@@ -18,8 +55,273 @@ class PostListView(AuthenticatedCreateViewMixin, generics.ListCreateAPIView):
 	serializer_class = PostSerializer
 	ordering = '-id'
 	pagination_class = CustomPagination
+	query_budget = 3
+	version_fields = ('comment_count',)
+	fragment_data_versions = ('authors',)
+
+	def get_data_versions(self):
+		return 'posts', 'authors'
+
+
+class PostDetailView(ConditionalGetMixin, SparseFieldsMixin, EagerLoadingMixin, AuthenticatedCreateViewMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
+	queryset = Post.objects.all()
+	serializer_class = PostSerializer
+	query_budget = 4
+	version_fields = ('comment_count',)
 
+	def get_data_versions(self):
+		return 'authors',
 
-class PostDetailView(AuthenticatedCreateViewMixin, generics.RetrieveUpdateDestroyAPIView):
+
+class PostExportView(StreamingExportMixin, EagerLoadingMixin, AuthenticatedViewMixin, generics.GenericAPIView):
+	"""
+	Streams all the posts matching the PostFilter params, see StreamingExportMixin
+	---
+	parameters:
+		- name: comments
+		  description: 1 to include each post's comments, filtered with the CommentFilter params prefixed with
+		    'comment-' e.g. comment-approved_comment=true
+		  type: integer
+		  paramType: query
+	"""
 	queryset = Post.objects.all()
 	serializer_class = PostSerializer
+	filter_backends = (DjangoFilterBackend,)
+	filter_class = PostFilter
+	comment_filter_prefix = 'comment'
+	query_budget = 2
+
+	def get_comment_filter_params(self):
+		# (FilterSet's own 'prefix' is ignored by rest_framework_filters)
+		if not hasattr(self, '_comment_filter_params'):
+			prefix = self.comment_filter_prefix + '-'
+			params = QueryDict(mutable=True)
+			for name, values in self.request.query_params.lists():
+				if name.startswith(prefix):
+					params.setlist(name[len(prefix):], values)
+			self._comment_filter_params = params
+		return self._comment_filter_params
+
+	def get_comments(self, posts):
+		"""
+		:return: post id vs. representations of its comments, for a batch of posts - a single query
+		"""
+		queryset = Comment.objects.filter(post__in=[post.pk for post in posts])
+		queryset = CommentFilter(self.get_comment_filter_params(), queryset=queryset).qs
+		queryset = CommentSerializer.setup_eager_loading(queryset).order_by('post', 'id')
+
+		serializer = CommentSerializer()
+		comments = defaultdict(list)
+		for comment in queryset.iterator():
+			comments[comment.post_id].append(serializer.to_representation(comment))
+		return comments
+
+	def get_export_rows(self, batch):
+		rows = super().get_export_rows(batch)
+		if Utils.query_param_int(self.request, 'comments', 0):
+			comments = self.get_comments(batch)
+			for post, row in zip(batch, rows):
+				row['comments'] = comments.get(post.pk, [])
+		return rows
+
+
+class TimelineView(EagerLoadingMixin, AuthenticatedViewMixin, generics.GenericAPIView):
+	"""
+	Home timeline of the authenticated user, the latest posts of the authors they follow (see post.timeline) newest
+	first. Paginated with a cursor, follow the 'next' link for older posts
+	"""
+	queryset = Post.objects.all()
+	serializer_class = PostSerializer
+	pagination_class = CustomCursorPagination
+	cursor_salt = 'post.views.TimelineView'
+	query_budget = 5
+
+	def decode_cursor(self, request):
+		encoded = Utils.query_param(request, self.paginator.cursor_query_param)
+		if encoded is None:
+			return None
+		try:
+			return int(signing.loads(encoded, salt=self.cursor_salt))
+		except (signing.BadSignature, TypeError, ValueError):
+			raise exceptions.NotFound(self.paginator.invalid_cursor_message)
+
+	def encode_cursor(self, request, before):
+		return replace_query_param(request.build_absolute_uri(), self.paginator.cursor_query_param,
+		                           signing.dumps(before, salt=self.cursor_salt))
+
+	def get(self, request, *args, **kwargs):
+		page_size = self.paginator.get_page_size(request)
+		ids = timeline_store.page(request.user.pk, self.decode_cursor(request), page_size)
+
+		# (a post deleted since it got into the timeline is simply missing from the page)
+		posts = list(self.get_queryset().filter(pk__in=ids).order_by('-id')) if ids else []
+		return Response(OrderedDict((
+			('next', self.encode_cursor(request, ids[-1]) if len(ids) == page_size else None),
+			('results', self.get_serializer(posts, many=True).data),
+		)))
+
+
+class PostBulkView(AuthenticatedViewMixin, generics.GenericAPIView):
+	"""
+	Creates (POST) or updates (PATCH, each item needs its 'id') posts in bulk, from a JSON array or from an NDJSON
+	stream (Content-Type: application/x-ndjson).
+
+	Items are validated one by one with PostSerializer and the valid ones written in chunks of 'chunk_size', each
+	chunk one transaction with a single INSERT (or UPDATE). An invalid item is reported against its index in the
+	input and doesn't stop the others.
+	"""
+	queryset = Post.objects.all()
+	serializer_class = PostSerializer
+	parser_classes = (JSONParser, NDJSONParser)
+	chunk_size = 500
+
+	def get_items(self, request):
+		items = request.data
+		if isinstance(items, dict):
+			raise exceptions.ParseError(_('expected a list of posts'))
+		return enumerate(items)
+
+	def validate_item(self, serializer, item):
+		"""
+		:return: (validated_data, None) or (None, errors)
+		"""
+		if isinstance(item, exceptions.APIException):
+			return None, {'non_field_errors': [item.detail]}
+		if not isinstance(item, dict):
+			return None, {'non_field_errors': [_('expected a post object')]}
+		try:
+			return serializer.run_validation(item), None
+		except exceptions.ValidationError as e:
+			return None, e.detail
+
+	def get_chunks(self, request, partial):
+		"""
+		Validates the items as they are read and yields them in chunks of (index, validated_data) of at most
+		'chunk_size' valid items, along with the (index, errors) of the invalid ones met so far
+		"""
+		# one unbound serializer validates all the items
+		serializer = self.get_serializer(partial=partial)
+		items = self.get_items(request)
+
+		while True:
+			chunk, errors, read = [], [], 0
+			for index, item in islice(items, self.chunk_size):
+				read += 1
+				data, item_errors = self.validate_item(serializer, item)
+				if not item_errors and partial:
+					if not isinstance(item.get('id'), int):
+						item_errors = {'id': [_('this field is required')]}
+					else:
+						data['id'] = item['id']
+				if item_errors:
+					errors.append({'index': index, 'errors': item_errors})
+				else:
+					chunk.append((index, data))
+			if not read:
+				return
+			yield chunk, errors
+
+	def bulk_insert(self, posts, now):
+		"""
+		Inserts 'posts' (all created at 'now') with a single INSERT and sets their pks
+		:return: False, with nothing inserted, if the new pks can't be told
+		"""
+		savepoint = transaction.savepoint()
+		Post.objects.bulk_create(posts)
+		if posts[0].pk is None:
+			# Only PostgreSQL hands back the new pks, elsewhere the rows of this INSERT should be the only ones of this
+			# user with this exact created_on, and auto increment pks follow the insert order - unless another
+			# request of the user inserted at the very same time
+			pks = list(Post.objects.filter(user=self.request.user, created_on=now).order_by('pk').values_list(
+				'pk', flat=True))
+			if len(pks) != len(posts):
+				transaction.savepoint_rollback(savepoint)
+				return False
+			for post, pk in zip(posts, pks):
+				post.pk = pk
+		transaction.savepoint_commit(savepoint)
+		return True
+
+	def create_chunk(self, chunk):
+		now = timezone.now()
+		posts = []
+		for index, data in chunk:
+			post = Post(**data)
+			post.set_timestamps(now)
+			posts.append(post)
+
+		with transaction.atomic():
+			if not self.bulk_insert(posts, now):
+				for post in posts:
+					post.save()  # indexed, cache versions bumped and fanned out by its own signals
+				return [{'index': index, 'id': post.pk} for (index, data), post in zip(chunk, posts)], []
+
+			get_search_backend().index_many(posts)
+			CacheVersions.bump_on_commit('posts')
+			fan_out_on_commit(self.request.user.pk, *[post.pk for post in posts])
+
+		return [{'index': index, 'id': post.pk} for (index, data), post in zip(chunk, posts)], []
+
+	def update_chunk(self, chunk):
+		ids = set(data['id'] for index, data in chunk)
+		# get_queryset() only has the user's own posts for writes
+		posts = {post.pk: post for post in self.get_queryset().filter(pk__in=ids)}
+
+		results, errors, values, updated = [], [], {}, {}
+		for index, data in chunk:
+			post = posts.get(data.pop('id'))
+			if post is None:
+				errors.append({'index': index, 'errors': {'id': [_('post not found')]}})
+				continue
+			data.pop('user', None)
+			for name, value in data.items():
+				setattr(post, name, value)
+				values.setdefault(name, {})[post.pk] = value
+			updated[post.pk] = post
+			results.append({'index': index, 'id': post.pk})
+
+		updated = list(updated.values())
+		if not updated:
+			return results, errors
+
+		now = timezone.now()
+		for post in updated:
+			post.set_timestamps(now)
+
+		# one UPDATE for the whole chunk, each field picks its per-row value with a CASE on pk
+		fields = {
+			name: Case(*[When(pk=pk, then=Value(value)) for pk, value in per_pk.items()],
+			           default=F(name), output_field=Post._meta.get_field(name))
+			for name, per_pk in values.items()
+		}
+		with transaction.atomic():
+			Post.objects.filter(pk__in=[post.pk for post in updated]).update(updated_on=now, **fields)
+			get_search_backend().index_many(updated)
+			CacheVersions.bump_on_commit('posts', *['post:{0}'.format(post.pk) for post in updated])
+
+		return results, errors
+
+	def write(self, request, partial):
+		write_chunk = self.update_chunk if partial else self.create_chunk
+
+		results, errors = [], []
+		for chunk, chunk_errors in self.get_chunks(request, partial):
+			errors.extend(chunk_errors)
+			if chunk:
+				written, write_errors = write_chunk(chunk)
+				results.extend(written)
+				errors.extend(write_errors)
+
+		errors.sort(key=lambda error: error['index'])
+		if errors and not results:
+			response_status = status.HTTP_400_BAD_REQUEST
+		else:
+			response_status = status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+		return Response({'count': len(results), 'results': results, 'errors': errors}, status=response_status)
+
+	def post(self, request, *args, **kwargs):
+		return self.write(request, partial=False)
+
+	def patch(self, request, *args, **kwargs):
+		return self.write(request, partial=True)
@@ -0,0 +1,335 @@
+import re
+from abc import ABCMeta, abstractmethod
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, When, Value, IntegerField, Sum, Count
+from django.utils.module_loading import import_string
+
+from search.models import SearchTerm
+
+term_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text, min_length=2, max_length=64):
+	if not text:
+		return []
+	return [term for term in term_re.findall(text.lower()) if min_length <= len(term) <= max_length]
+
+
+def get_index_fields(model):
+	"""
+	:return: model's ((field_name, weight), ...) as declared by 'search_index_fields', see search.mixins.SearchIndexMixin
+	"""
+	return tuple(getattr(model, 'search_index_fields', ()))
+
+
+class BaseSearchBackend(metaclass=ABCMeta):
+	"""
+	Search backends keep a full-text index of the 'search_index_fields' of a model and answer
+	'which objects of this queryset match all of these terms, best first'
+
+	Sub-classes implement index()/remove() (called from SearchIndexMixin on save/delete), match() and rank(), or
+	override filter_queryset() if the database can do the matching and ranking in the same query.
+
+	Matching is never truncated. Only the ordering is: the best 'max_results' matches come first by relevance, any
+	further matches follow them in the queryset's own ordering
+	"""
+	max_results = getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+	min_term_length = 2
+
+	def index(self, instance):
+		pass
+
+	def index_many(self, instances):
+		for instance in instances:
+			self.index(instance)
+
+	def remove(self, instance):
+		pass
+
+	def clear(self, model):
+		pass
+
+	def rebuild(self, model, batch_size=500):
+		"""
+		Re-indexes all objects of 'model', in batches of 'batch_size'
+		:return: no. of objects indexed
+		"""
+		self.clear(model)
+
+		count, last_pk = 0, None
+		queryset = model._default_manager.order_by('pk')
+		while True:
+			batch = queryset.filter(pk__gt=last_pk) if last_pk is not None else queryset
+			batch = list(batch[:batch_size])
+			if not batch:
+				return count
+			self.index_many(batch)
+			count += len(batch)
+			last_pk = batch[-1].pk
+
+	@abstractmethod
+	def match(self, queryset, terms, fields):
+		"""
+		:return: 'queryset' narrowed to the objects matching all of 'terms' in any of 'fields'
+		"""
+
+	def rank(self, queryset, terms, fields):
+		"""
+		:param queryset: the matching objects, as returned by match()
+		:return: pks of the best 'max_results' objects in 'queryset', best match first. None keeps the queryset's
+		  ordering
+		"""
+		return None
+
+	def tokenize(self, query):
+		# terms shorter than the index keeps can't match, they are dropped rather than failing the whole search
+		return tokenize(query, min_length=self.min_term_length)
+
+	def get_fields(self, model, fields=None):
+		indexed = [name for name, weight in get_index_fields(model)]
+		if fields is None:
+			return indexed
+		return [name for name in indexed if name in fields]
+
+	def filter_queryset(self, queryset, query, fields=None, ordered=True):
+		"""
+		:param queryset: queryset to search in
+		:param query: search text as entered by client
+		:param fields: restrict the search to these (indexed) fields, all if None
+		:param ordered: order result by relevance, else queryset's ordering is kept
+		"""
+		terms = self.tokenize(query)
+		fields = self.get_fields(queryset.model, fields)
+		if not terms or not fields:
+			return queryset.none()
+
+		terms = sorted(set(terms))
+		queryset = self.match(queryset, terms, fields)
+		if not ordered:
+			return queryset
+
+		pks = self.rank(queryset.order_by(), terms, fields)
+		if pks:
+			ordering = queryset.query.order_by or queryset.model._meta.ordering
+			queryset = queryset.order_by(
+				Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(pks)], default=Value(len(pks)),
+				     output_field=IntegerField()),
+				*ordering)
+		return queryset
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+	"""
+	Portable backend, keeps its own inverted index in search.models.SearchTerm
+	"""
+
+	def _terms(self, instance):
+		label = instance._meta.label_lower
+		for field, weight in get_index_fields(type(instance)):
+			for term, occurrences in Counter(tokenize(getattr(instance, field))).items():
+				yield SearchTerm(label=label, object_id=instance.pk, field=field, term=term, weight=weight * occurrences)
+
+	def index_many(self, instances):
+		instances = list(instances)
+		if not instances:
+			return
+
+		model = type(instances[0])
+		with transaction.atomic(using=router.db_for_write(SearchTerm)):
+			SearchTerm.objects.filter(label=model._meta.label_lower, object_id__in=[i.pk for i in instances]).delete()
+			SearchTerm.objects.bulk_create([term for instance in instances for term in self._terms(instance)])
+
+	def index(self, instance):
+		self.index_many([instance])
+
+	def remove(self, instance):
+		SearchTerm.objects.filter(label=instance._meta.label_lower, object_id=instance.pk).delete()
+
+	def clear(self, model):
+		SearchTerm.objects.filter(label=model._meta.label_lower).delete()
+
+	def match(self, queryset, terms, fields):
+		# one IN (subquery) per term, each served by the (label, term, object_id) index
+		label = queryset.model._meta.label_lower
+		for term in terms:
+			queryset = queryset.filter(pk__in=SearchTerm.objects.filter(
+				label=label, term=term, field__in=fields).values('object_id'))
+		return queryset
+
+	def rank(self, queryset, terms, fields):
+		rows = SearchTerm.objects.filter(
+			label=queryset.model._meta.label_lower,
+			term__in=terms,
+			field__in=fields,
+			object_id__in=queryset.values('pk'),
+		).values('object_id').annotate(
+			matched=Count('term', distinct=True),
+			score=Sum('weight'),
+		).filter(matched=len(terms)).order_by('-score', '-object_id')
+
+		return [row['object_id'] for row in rows[:self.max_results]]
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+	"""
+	For local development/testing on SQLite, keeps one FTS5 virtual table per model (rowid = object pk, one column
+	per indexed field) and ranks with bm25() using the field weights
+	"""
+	_created = set()
+
+	def _table(self, model):
+		return 'search_fts_' + model._meta.db_table
+
+	def _create_table(self, model):
+		connection = connections[router.db_for_write(model)]
+		table = self._table(model)
+		if (connection.alias, table) not in self._created:
+			columns = ', '.join(connection.ops.quote_name(name) for name, weight in get_index_fields(model))
+			with connection.cursor() as cursor:
+				cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS {0} USING fts5({1})'.format(table, columns))
+			self._created.add((connection.alias, table))
+		return connection
+
+	def _cursor(self, model):
+		return self._create_table(model).cursor()
+
+	def index_many(self, instances):
+		instances = list(instances)
+		if not instances:
+			return
+
+		model = type(instances[0])
+		names = [name for name, weight in get_index_fields(model)]
+		table = self._table(model)
+		qn = connections[router.db_for_write(model)].ops.quote_name
+		with self._cursor(model) as cursor:
+			cursor.executemany('DELETE FROM {0} WHERE rowid = %s'.format(table), [(i.pk,) for i in instances])
+			cursor.executemany(
+				'INSERT INTO {0} (rowid, {1}) VALUES (%s, {2})'.format(
+					table, ', '.join(qn(name) for name in names), ', '.join(['%s'] * len(names))),
+				[[i.pk] + [getattr(i, name) or '' for name in names] for i in instances]
+			)
+
+	def index(self, instance):
+		self.index_many([instance])
+
+	def remove(self, instance):
+		with self._cursor(type(instance)) as cursor:
+			cursor.execute('DELETE FROM {0} WHERE rowid = %s'.format(self._table(type(instance))), [instance.pk])
+
+	def clear(self, model):
+		with self._cursor(model) as cursor:
+			cursor.execute('DELETE FROM {0}'.format(self._table(model)))
+
+	def _match(self, fields, terms):
+		return '{{{0}}} : ({1})'.format(' '.join(fields), ' '.join('"%s"' % term for term in terms))
+
+	def match(self, queryset, terms, fields):
+		model = queryset.model
+		connection = self._create_table(model)
+		column = '{0}.{1}'.format(connection.ops.quote_name(model._meta.db_table),
+		                          connection.ops.quote_name(model._meta.pk.column))
+		return queryset.extra(
+			where=['{0} IN (SELECT rowid FROM {1} WHERE {1} MATCH %s)'.format(column, self._table(model))],
+			params=[self._match(fields, terms)])
+
+	def rank(self, queryset, terms, fields):
+		model = queryset.model
+		table = self._table(model)
+		weights = ', '.join(str(float(weight)) for name, weight in get_index_fields(model))
+		match = self._match(fields, terms)
+		subquery, params = queryset.values_list('pk').query.sql_with_params()
+
+		with self._cursor(model) as cursor:
+			cursor.execute(
+				'SELECT rowid FROM {0} WHERE {0} MATCH %s AND rowid IN ({1}) ORDER BY bm25({0}, {2}) LIMIT %s'.format(
+					table, subquery, weights),
+				[match] + list(params) + [self.max_results]
+			)
+			return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFullTextSearchBackend(BaseSearchBackend):
+	"""
+	Production backend, the index is InnoDB's own FULLTEXT index on the model's table (created by
+	'manage.py rebuild_search_index') so there is nothing to maintain on save. Matching and
+	relevance ranking are done in the same query as the rest of the queryset.
+
+	InnoDB doesn't index words shorter than 'innodb_ft_min_token_size' (3 by default), a required (+) term shorter
+	than that would never match - set SEARCH_MYSQL_MIN_TOKEN_SIZE if the server's is different
+	"""
+	min_term_length = getattr(settings, 'SEARCH_MYSQL_MIN_TOKEN_SIZE', 3)
+
+	def _match(self, model, fields, connection):
+		table = connection.ops.quote_name(model._meta.db_table)
+		columns = ', '.join(
+			'{0}.{1}'.format(table, connection.ops.quote_name(model._meta.get_field(name).column)) for name in fields)
+		return 'MATCH ({0}) AGAINST (%s IN BOOLEAN MODE)'.format(columns)
+
+	def _against(self, terms):
+		return ' '.join('+' + term for term in sorted(set(terms)))  # all terms required
+
+	def match(self, queryset, terms, fields):
+		connection = connections[queryset.db]
+		return queryset.extra(where=[self._match(queryset.model, fields, connection)], params=[self._against(terms)])
+
+	def filter_queryset(self, queryset, query, fields=None, ordered=True):
+		terms = self.tokenize(query)
+		fields = self.get_fields(queryset.model, fields)
+		if not terms or not fields:
+			return queryset.none()
+
+		model = queryset.model
+		connection = connections[queryset.db]
+		against = self._against(terms)
+		queryset = self.match(queryset, terms, fields)
+
+		if ordered:
+			# Relevance is the weighted sum of per-field relevance, each served by its own single column index. The
+			# whole result is ordered by it, 'max_results' doesn't apply
+			weights = dict(get_index_fields(model))
+			rank = ' + '.join('{0} * {1}'.format(float(weights[name]), self._match(model, [name], connection))
+			                  for name in fields)
+			queryset = queryset.extra(select={'search_rank': rank}, select_params=[against] * len(fields))
+			queryset = queryset.order_by('-search_rank')
+		return queryset
+
+	def rebuild(self, model, batch_size=500):
+		# InnoDB maintains the index itself, we just need to make sure it exists
+		self.create_indexes(model)
+		return model._default_manager.count()
+
+	def create_indexes(self, model):
+		"""
+		Creates the FULLTEXT indexes used by filter_queryset(), one over all indexed fields and one per field
+		"""
+		connection = connections[router.db_for_write(model)]
+		qn = connection.ops.quote_name
+		table = model._meta.db_table
+		names = [name for name, weight in get_index_fields(model)]
+
+		with connection.cursor() as cursor:
+			cursor.execute(
+				'SELECT DISTINCT index_name FROM information_schema.statistics '
+				'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+			existing = set(row[0] for row in cursor.fetchall())
+
+			for fields in [names] + [[name] for name in names if len(names) > 1]:
+				index_name = 'search_{0}_{1}'.format(table, '_'.join(fields))[:64]
+				if index_name not in existing:
+					cursor.execute('ALTER TABLE {0} ADD FULLTEXT INDEX {1} ({2})'.format(
+						qn(table), qn(index_name),
+						', '.join(qn(model._meta.get_field(name).column) for name in fields)))
+
+
+_backend = None
+
+
+def get_search_backend():
+	global _backend
+	if _backend is None:
+		_backend = import_string(getattr(settings, 'SEARCH_BACKEND', 'search.backends.InvertedIndexSearchBackend'))()
+	return _backend
@@ -0,0 +1,43 @@
+import rest_framework_filters as filters
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from search.backends import get_search_backend
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+	"""
+	Drop-in for rest_framework.filters.SearchFilter ('search' param and view's 'search_fields') served by the
+	configured search backend instead of LIKE '%term%' scans.
+
+	Results are ordered by relevance unless the client asks for an explicit 'ordering', so this should be placed
+	after OrderingFilter in the view's 'filter_backends'
+	"""
+	search_param = api_settings.SEARCH_PARAM
+	ordering_param = api_settings.ORDERING_PARAM
+
+	def get_search_fields(self, view):
+		# SearchFilter's lookup prefixes ('^', '=', '@', '$') don't apply here
+		return [field.lstrip('^=@$') for field in getattr(view, 'search_fields', ())]
+
+	def filter_queryset(self, request, queryset, view):
+		query = request.query_params.get(self.search_param, '')
+		if not query.strip():
+			return queryset
+
+		return get_search_backend().filter_queryset(
+			queryset, query,
+			fields=self.get_search_fields(view),
+			ordered=self.ordering_param not in request.query_params
+		)
+
+
+class FullTextFilter(filters.CharFilter):
+	"""
+	FilterSet filter matching a single indexed field through the search backend
+	"""
+
+	def filter(self, qs, value):
+		if value in ([], (), {}, None, ''):
+			return qs
+		return get_search_backend().filter_queryset(qs, value, fields=(self.name,), ordered=False)
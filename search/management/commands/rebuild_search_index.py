@@ -0,0 +1,32 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from search.backends import get_search_backend, get_index_fields
+
+
+class Command(BaseCommand):
+	help = 'Rebuilds the search index of all searchable models (or of the given ones) with the configured backend'
+
+	def add_arguments(self, parser):
+		parser.add_argument('models', nargs='*', help="model labels e.g 'post.Post', all searchable models if none")
+		parser.add_argument('--batch-size', type=int, default=500)
+
+	def handle(self, *args, **options):
+		if options['models']:
+			try:
+				models = [apps.get_model(label) for label in options['models']]
+			except (LookupError, ValueError) as e:
+				raise CommandError(e)
+		else:
+			models = [model for model in apps.get_models() if get_index_fields(model)]
+
+		backend = get_search_backend()
+		for model in models:
+			if not get_index_fields(model):
+				raise CommandError("'{0}' has no 'search_index_fields'".format(model._meta.label))
+
+			start = time.time()
+			count = backend.rebuild(model, batch_size=options['batch_size'])
+			self.stdout.write('{0}: {1} objects indexed in {2:.1f}s'.format(model._meta.label, count, time.time() - start))
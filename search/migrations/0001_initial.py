@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+	initial = True
+
+	dependencies = [
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name='SearchTerm',
+			fields=[
+				('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('label', models.CharField(max_length=100)),
+				('object_id', models.IntegerField()),
+				('field', models.CharField(max_length=50)),
+				('term', models.CharField(max_length=64)),
+				('weight', models.FloatField()),
+			],
+			options={
+				'db_table': 'search_term',
+			},
+		),
+		migrations.AlterIndexTogether(
+			name='searchterm',
+			index_together=set([('label', 'term', 'object_id'), ('label', 'object_id')]),
+		),
+	]
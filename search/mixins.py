@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from search.backends import get_search_backend
+
+
+class SearchIndexMixin(object):
+	"""
+	Model mixin, keeps the configured search backend's index up-to-date for the fields listed in
+	'search_index_fields' i.e ((field_name, relevance_weight), ...)
+	"""
+	search_index_fields = ()
+
+	def save(self, *args, **kwargs):
+		ret = super().save(*args, **kwargs)
+		get_search_backend().index(self)
+		return ret
+
+
+@receiver(post_delete, dispatch_uid='search.mixins.remove_from_search_index')
+def remove_from_search_index(sender, instance, **kwargs):
+	# Signal rather than delete() override so that cascaded deletes are covered too
+	if isinstance(instance, SearchIndexMixin):
+		get_search_backend().remove(instance)
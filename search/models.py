@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class SearchTerm(models.Model):
+	"""
+	Inverted index entry, one row per (object, field, term) - see search.backends.InvertedIndexSearchBackend
+	"""
+	label = models.CharField(max_length=100)  # model label i.e 'app_label.model_name'
+	object_id = models.IntegerField()
+	field = models.CharField(max_length=50)
+	term = models.CharField(max_length=64)
+	weight = models.FloatField()
+
+	class Meta:
+		db_table = 'search_term'
+		index_together = (
+			('label', 'term', 'object_id'),  # lookup by term
+			('label', 'object_id'),  # re-indexing/removal of an object
+		)
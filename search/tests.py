@@ -0,0 +1,61 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from post.models import Post
+from search.backends import InvertedIndexSearchBackend, SQLiteFTS5SearchBackend
+
+
+class SearchBackendTestMixin(object):
+	backend_class = None
+
+	def setUp(self):
+		self.backend = self.backend_class()
+		self.backend.max_results = 2
+		user = get_user_model().objects.create_user(username='author', email='author@example.com',
+		                                            password='password123')
+		# best match first: the term in the title weighs more than in the description, more occurrences more still
+		self.posts = [Post.objects.create(user=user, title=title, desc=desc) for title, desc in (
+			('apple apple', 'apple'),
+			('apple', 'pie'),
+			('pie', 'apple'),
+			('pie', 'apple pie'),
+			('pie', 'banana'),
+		)]
+		self.backend.rebuild(Post)
+
+	def search(self, query, **kwargs):
+		return list(self.backend.filter_queryset(Post.objects.order_by('-id'), query, **kwargs)
+		            .values_list('pk', flat=True))
+
+	def test_matches_are_not_capped(self):
+		pks = [post.pk for post in self.posts]
+		self.assertEqual(self.search('apple', ordered=False), [pks[3], pks[2], pks[1], pks[0]])
+		self.assertEqual(self.backend.filter_queryset(Post.objects.all(), 'apple').count(), 4)
+
+	def test_ranked_first(self):
+		pks = [post.pk for post in self.posts]
+		# the best 'max_results' by relevance, the rest in the queryset's ordering
+		self.assertEqual(self.search('apple'), [pks[0], pks[1], pks[3], pks[2]])
+
+	def test_all_terms(self):
+		pks = [post.pk for post in self.posts]
+		self.assertEqual(sorted(self.search('pie apple')), [pks[1], pks[2], pks[3]])
+		self.assertEqual(self.search('apple', fields=('title',), ordered=False), [pks[1], pks[0]])
+		self.assertEqual(self.search('cherry'), [])
+
+
+class InvertedIndexSearchBackendTests(SearchBackendTestMixin, TestCase):
+	backend_class = InvertedIndexSearchBackend
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class SQLiteFTS5SearchBackendTests(SearchBackendTestMixin, TestCase):
+	backend_class = SQLiteFTS5SearchBackend
+
+	def setUp(self):
+		# the table is created in the test's transaction, rolled back after each test
+		SQLiteFTS5SearchBackend._created.clear()
+		super().setUp()
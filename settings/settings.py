@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 	'post.apps.PostConfig',
 	'comment.apps.CommentConfig',
 	'user.apps.UserConfig',
+	'search.apps.SearchConfig',
 ]
 
 MIDDLEWARE_CLASSES = [
@@ -56,6 +57,7 @@ MIDDLEWARE_CLASSES = [
 	'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
 	'django.contrib.messages.middleware.MessageMiddleware',
 	'django.middleware.clickjacking.XFrameOptionsMiddleware',
+	'utils.querybudget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'urls'
@@ -112,6 +114,15 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTHENTICATION_BACKENDS = ['user.authentication.DRFAuthBackend']
 
+# Kind of auth token issued on login/signup: 'db' (user.models.Token) or 'signed' (stateless, see user.signedtokens).
+# Both kinds are accepted either way
+AUTH_TOKEN_MODE = 'db'
+
+SIGNED_TOKEN = {
+	'LIFETIME_DAYS': 30,
+	'REFRESH': 30,  # seconds between reloads of the revocations made by other processes
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/1.9/topics/i18n/
 
@@ -148,3 +159,96 @@ REST_FRAMEWORK = {
 	'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
 	'PAGE_SIZE': 5,
 }
+
+# Per request query budget, see utils.querybudget.QueryBudgetMiddleware. Views can override 'DEFAULT' with their own
+# 'query_budget' attribute. With 'RAISE' an over-budget request fails (meant for test runs), otherwise it is logged
+QUERY_BUDGET = {
+	'ENABLED': False,
+	'DEFAULT': 10,
+	'RAISE': False,
+	'METHODS': ('GET', 'HEAD'),
+}
+
+# Full-text search for the 'search' param of post/comment lists, see search.backends. MySQLFullTextSearchBackend
+# uses InnoDB FULLTEXT indexes ('manage.py rebuild_search_index' creates them), SQLiteFTS5SearchBackend is for local
+# SQLite databases and InvertedIndexSearchBackend works on any database
+SEARCH_BACKEND = 'search.backends.MySQLFullTextSearchBackend'
+# No. of best matches ordered by relevance, further matches follow them unranked (matching itself isn't capped)
+SEARCH_MAX_RESULTS = 1000
+
+# The response cache and the version counters it is keyed on must be shared by all worker processes, point 'default'
+# to memcached/redis in a multi-process deployment. With the per-process locmem cache a write only invalidates the
+# worker it went through
+CACHES = {
+	'default': {
+		'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+	},
+}
+
+# Cache of anonymous post/comment list responses, see utils.viewmixins.ResponseCacheMixin
+RESPONSE_CACHE = {
+	'ENABLED': True,
+	'CACHE': 'default',
+	'TIMEOUT': 300,
+}
+
+# Cache of the encoded JSON of each post/comment in list responses (in the RESPONSE_CACHE's cache), see
+# utils.viewmixins.FragmentCacheMixin
+FRAGMENT_CACHE = {
+	'ENABLED': True,
+	'TIMEOUT': 3600,
+}
+
+# Home timelines (in the RESPONSE_CACHE's cache), see post.timeline. Posts of authors with more than FAN_OUT_LIMIT
+# followers are merged in when a timeline is read instead of being pushed to every follower's timeline
+TIMELINE = {
+	'MAX_LENGTH': 800,
+	'FAN_OUT_LIMIT': 10000,
+	'BATCH_SIZE': 1000,
+	'TIMEOUT': 86400,
+}
+
+# Process local cache of auth tokens, see user.tokencache. Invalidation only reaches the process it happens in, so a
+# logout/deactivation can take up to TTL seconds to be seen by the other workers
+TOKEN_CACHE = {
+	'ENABLED': True,
+	'MAX_SIZE': 10000,
+	'TTL': 60,
+}
+
+# Process local cache of the ids of existing posts for the comment views, see post.existence. A deleted post can take
+# up to TTL seconds to 404 in the other workers (its comments are gone right away)
+KNOWN_POSTS = {
+	'ENABLED': True,
+	'MAX_SIZE': 10000,
+	'TTL': 60,
+}
+
+# Token expiry extensions (sliding expiry on login) and last_login updates are buffered and written in batches, see
+# user.writebuffer, at least every INTERVAL seconds (by a background thread, started by the first buffered write in
+# each process). An extension is only deferred while the stored expiry is more than MARGIN seconds away
+WRITE_COALESCING = {
+	'ENABLED': True,
+	'INTERVAL': 5,
+	'MAX_PENDING': 500,
+	'MARGIN': 3600,
+}
+
+# Password hashing (login/signup) runs in a pool of WORKERS processes, once MAX_QUEUE hashes are waiting for a worker
+# requests get a 503 with Retry-After: RETRY_AFTER seconds, see user.hashing
+PASSWORD_HASHING = {
+	'ENABLED': True,
+	'WORKERS': 2,
+	'MAX_QUEUE': 16,
+	'RETRY_AFTER': 1,
+	'TIMEOUT': 10,
+}
+
+# Expired tokens are deleted by 'manage.py sweep_tokens' (e.g. from cron) or, if ENABLED, by a background thread in each
+# process every INTERVAL seconds - BATCH_SIZE rows per DELETE, PAUSE seconds apart
+TOKEN_SWEEPER = {
+	'ENABLED': False,
+	'INTERVAL': 3600,
+	'BATCH_SIZE': 1000,
+	'PAUSE': 0.1,
+}
@@ -3,3 +3,20 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = 'user'
+
+    def ready(self):
+        from django.contrib.auth import models as auth_models
+        from django.contrib.auth.signals import user_logged_in
+        from user.writebuffer import update_last_login
+
+        # connects the signed token revocation receivers
+        import user.signedtokens
+
+        # last_login writes are coalesced, replace django.contrib.auth's receiver (django.contrib.auth is ready by now)
+        user_logged_in.disconnect(auth_models.update_last_login)
+        user_logged_in.disconnect(dispatch_uid='update_last_login')  # how newer django connects it
+        user_logged_in.connect(update_last_login, dispatch_uid='user.writebuffer.update_last_login')
+
+        # background deletion of expired tokens, if enabled in settings.TOKEN_SWEEPER
+        from user.sweeper import start_sweeper
+        start_sweeper()
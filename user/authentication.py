@@ -1,3 +1,4 @@
+from django.core import signing
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth import get_user_model, backends
@@ -5,7 +6,14 @@ from django.contrib.auth import get_user_model, backends
 from rest_framework import exceptions
 from rest_framework.authentication import TokenAuthentication as BaseTokenAuthentication
 
+from user import hashing
 from user.models import Token
+from user.signedtokens import SignedToken, SignedTokenUser, revocations
+from user.tokencache import token_cache
+
+invalid_token = _("Invalid session token, please login again to continue.")
+token_expired = _("Your session token has expired, please login again to continue.")
+account_disabled = _("Your account is disabled, please contact customer care.")
 
 
 class TokenAuthentication(BaseTokenAuthentication):
@@ -16,14 +24,15 @@ class TokenAuthentication(BaseTokenAuthentication):
 	model = Token
 
 	def authenticate_credentials(self, key):
-		invalid_token = _("Invalid session token, please login again to continue.")
-		token_expired = _("Your session token has expired, please login again to continue.")
-		account_disabled = _("Your account is disabled, please contact customer care.")
-
-		try:
-			token = self.model.objects.select_related('user').get(key=key)
-		except self.model.DoesNotExist:
-			raise exceptions.AuthenticationFailed(invalid_token)
+		token = token_cache.get(key) if token_cache else None
+		if token is None:
+			since = token_cache.invalidations if token_cache else None
+			try:
+				token = self.model.objects.select_related('user').get(key=key)
+			except self.model.DoesNotExist:
+				raise exceptions.AuthenticationFailed(invalid_token)
+			if token_cache:
+				token_cache.set(token, since=since)
 
 		if timezone.now().__gt__(token.expiry):
 			raise exceptions.AuthenticationFailed(token_expired)
@@ -34,6 +43,32 @@ class TokenAuthentication(BaseTokenAuthentication):
 		return token.user, token
 
 
+class SignedTokenAuthentication(BaseTokenAuthentication):
+	"""
+	Authenticates the stateless tokens of user.signedtokens, with no DB access - the user is loaded lazily, only if
+	the view needs more than its pk. Any other token is left to the next authentication class (TokenAuthentication)
+	so that both kinds of tokens work whichever AUTH_TOKEN_MODE issues the new ones.
+	"""
+
+	def authenticate_credentials(self, key):
+		if ':' not in key:
+			return None  # not signed, a user.models.Token key
+
+		try:
+			token = SignedToken.load(key)
+		except signing.BadSignature:
+			raise exceptions.AuthenticationFailed(invalid_token)
+
+		if timezone.now().__gt__(token.expiry):
+			raise exceptions.AuthenticationFailed(token_expired)
+
+		# deactivation revokes all the user's tokens
+		if revocations.is_revoked(token):
+			raise exceptions.AuthenticationFailed(invalid_token)
+
+		return SignedTokenUser(token.user_id), token
+
+
 class DRFAuthBackend(backends.ModelBackend):
 	"""
 	override the authenticate method to implement login mechanism.
@@ -45,9 +80,9 @@ class DRFAuthBackend(backends.ModelBackend):
 				user = UserModel.objects.get(username=username)
 			else:
 				user = UserModel.objects.get(**kwargs)
-			if user.check_password(password):
+			if hashing.check_password(user, password):
 				return user
 		except UserModel.DoesNotExist:
 			# Run the default password hasher once to reduce the timing
 			# difference between an existing and a non-existing user (#20760).
-			UserModel().set_password(password)
+			hashing.make_password(password)
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions, status
+
+logger = logging.getLogger(__name__)
+
+config = getattr(settings, 'PASSWORD_HASHING', {})
+
+
+class HashingBusy(exceptions.APIException):
+	"""
+	All hashing workers are busy and the queue is full, DRF sends 'wait' as the Retry-After header
+	"""
+	status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+	default_detail = _('Too many login attempts right now, please try again shortly.')
+
+	def __init__(self, wait, detail=None):
+		super().__init__(detail)
+		self.wait = wait
+
+
+# Run in the worker processes (forked, so settings.PASSWORD_HASHERS etc. are there), return the time they started
+# at so that the time spent waiting in the queue can be told from the hashing itself
+
+def _check_password(password, encoded):
+	started = time.time()
+	return started, hashers.check_password(password, encoded)
+
+
+def _make_password(password):
+	started = time.time()
+	return started, hashers.make_password(password)
+
+
+class HashingStats(object):
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.count = self.rejected = 0
+		self.queue_wait = self.hash_time = 0.0  # totals, seconds
+		self.max_queue_wait = self.max_hash_time = 0.0
+
+	def add(self, queue_wait, hash_time):
+		with self._lock:
+			self.count += 1
+			self.queue_wait += queue_wait
+			self.hash_time += hash_time
+			self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+			self.max_hash_time = max(self.max_hash_time, hash_time)
+
+	def reject(self):
+		with self._lock:
+			self.rejected += 1
+
+	def as_dict(self):
+		with self._lock:
+			return {
+				'count': self.count,
+				'rejected': self.rejected,
+				'avg_queue_wait': self.queue_wait / self.count if self.count else 0.0,
+				'avg_hash_time': self.hash_time / self.count if self.count else 0.0,
+				'max_queue_wait': self.max_queue_wait,
+				'max_hash_time': self.max_hash_time,
+			}
+
+
+class HashingPool(object):
+	"""
+	Runs the (deliberately slow) password hashing in a pool of 'workers' processes instead of the request thread, at
+	most 'max_queue' hashes wait for a free worker - beyond that HashingBusy (503) is raised right away rather than
+	letting requests pile up behind a login burst.
+	"""
+
+	def __init__(self, workers=2, max_queue=16, retry_after=1, timeout=10):
+		self.workers = workers
+		self.max_queue = max_queue
+		self.retry_after = retry_after
+		self.timeout = timeout
+		self.stats = HashingStats()
+		self._slots = threading.BoundedSemaphore(workers + max_queue)
+		self._lock = threading.Lock()
+		self._executor = None
+
+	def _get_executor(self):
+		with self._lock:
+			if self._executor is None:
+				self._executor = ProcessPoolExecutor(max_workers=self.workers)
+			return self._executor
+
+	def run(self, func, *args):
+		if not self._slots.acquire(blocking=False):
+			self.stats.reject()
+			raise HashingBusy(self.retry_after)
+
+		try:
+			submitted = time.time()
+			future = self._get_executor().submit(func, *args)
+		except Exception:
+			self._slots.release()
+			raise
+		# the slot is held until the worker is done with it, not just until we stop waiting (timeout)
+		future.add_done_callback(lambda done: self._slots.release())
+
+		try:
+			started, result = future.result(timeout=self.timeout)
+		except TimeoutError:
+			future.cancel()
+			logger.warning('password hashing timed out after %ss', self.timeout)
+			raise HashingBusy(self.retry_after)
+		self.stats.add(max(0.0, started - submitted), max(0.0, time.time() - started))
+		return result
+
+
+def _create_pool():
+	if not config.get('ENABLED', True):
+		return None
+	return HashingPool(workers=config.get('WORKERS', 2), max_queue=config.get('MAX_QUEUE', 16),
+	                   retry_after=config.get('RETRY_AFTER', 1), timeout=config.get('TIMEOUT', 10))
+
+
+pool = _create_pool()
+
+
+def make_password(password):
+	if pool is None:
+		return hashers.make_password(password)
+	return pool.run(_make_password, password)
+
+
+def check_password(user, password):
+	"""
+	Same as user.check_password(password) (including the upgrade of an outdated hash) but hashing in the pool
+	"""
+	if pool is None:
+		return user.check_password(password)
+
+	matched = pool.run(_check_password, password, user.password)
+	if matched:
+		preferred, hasher = hashers.get_hasher('default'), hashers.identify_hasher(user.password)
+		if hasher.algorithm != preferred.algorithm or preferred.must_update(user.password):
+			# best effort, a busy pool must not fail a correct login - the hash is upgraded on a later one
+			try:
+				user.password = make_password(password)
+			except HashingBusy:
+				pass
+			else:
+				user.save(update_fields=['password'])
+	return matched
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model, hashers
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from user.utils import AuthUtils
+
+FIELDS = ('email', 'mobile', 'first_name', 'last_name', 'password', 'password_hash', 'is_active')
+
+
+def _read_csv(stream):
+	for number, row in enumerate(csv.DictReader(stream), 2):
+		yield number, row
+
+
+def _read_jsonl(stream):
+	for number, line in enumerate(stream, 1):
+		if not line.strip():
+			continue
+		try:
+			row = json.loads(line)
+		except ValueError as e:
+			row = e
+		yield number, row if isinstance(row, (dict, ValueError)) else ValueError('not an object')
+
+
+def _is_true(value, default):
+	"""
+	:return: 'default' if no value was given (missing, null or an empty CSV cell)
+	"""
+	if isinstance(value, bool):
+		return value
+	value = '' if value is None else str(value).strip().lower()
+	if not value:
+		return default
+	return value not in ('0', 'false', 'no')
+
+
+class Command(BaseCommand):
+	help = ('Imports users from a CSV (with a header row) or JSON lines file, columns/keys: ' + ', '.join(FIELDS) +
+	        '. Either a plain password (hashed here) or a password_hash already in one of the PASSWORD_HASHERS formats, '
+	        'neither means an unusable password. Users already registered with the email/mobile are skipped.')
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', help="file to import, '-' for stdin")
+		parser.add_argument('--format', choices=('csv', 'jsonl'), help='by default from the file extension')
+		parser.add_argument('--batch-size', type=int, default=1000)
+		parser.add_argument('--workers', type=int, default=2, help='processes hashing plain passwords')
+		parser.add_argument('--dry-run', action='store_true', help='validate only, nothing is written')
+
+	def handle(self, *args, **options):
+		path = options['path']
+		file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl' if path != '-' else None)
+		if file_format is None:
+			raise CommandError('--format is required when reading from stdin')
+
+		self.UserModel = get_user_model()
+		self.dry_run = options['dry_run']
+		self.seen = set()  # emails/mobiles already in this file
+		self.read = self.imported = self.skipped = 0
+		self.start = time.time()
+
+		stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8') if path == '-' else open(
+			path, encoding='utf-8', newline='' if file_format == 'csv' else None)
+		rows = (_read_csv if file_format == 'csv' else _read_jsonl)(stream)
+
+		with ProcessPoolExecutor(max_workers=options['workers']) as self.executor:
+			try:
+				while True:
+					chunk = list(islice(rows, options['batch_size']))
+					if not chunk:
+						break
+					self.import_chunk(chunk)
+					self.report()
+			finally:
+				if stream is not sys.stdin:
+					stream.close()
+
+		self.report(done=True)
+
+	def report(self, done=False):
+		elapsed = time.time() - self.start
+		self.stdout.write('{0}{1} read, {2} {3}, {4} skipped in {5:.1f}s ({6:.0f} users/s)'.format(
+			'done: ' if done else '', self.read, self.imported, 'valid' if self.dry_run else 'imported', self.skipped,
+			elapsed, self.read / elapsed if elapsed else 0))
+
+	def skip(self, number, reason):
+		self.skipped += 1
+		self.stderr.write('line {0}: {1}'.format(number, reason))
+
+	def validate(self, number, row):
+		"""
+		:return: cleaned row or None if invalid (reported)
+		"""
+		if isinstance(row, ValueError):
+			return self.skip(number, 'invalid JSON ({0})'.format(row))
+
+		data = {key: (row.get(key) or '') for key in FIELDS}
+		for key in ('email', 'mobile', 'first_name', 'last_name'):
+			data[key] = str(data[key]).strip()
+
+		if not AuthUtils.validate_email(data['email']):
+			return self.skip(number, 'invalid email')
+		data['email'] = self.UserModel.objects.normalize_email(data['email'])
+		if data['mobile'] and not AuthUtils.validate_mobile(data['mobile']):
+			return self.skip(number, 'invalid mobile')
+		for key in ('first_name', 'last_name'):
+			if data[key] and not AuthUtils.validate_name(data[key]):
+				return self.skip(number, 'invalid ' + key)
+
+		if data['password_hash']:
+			try:
+				hashers.identify_hasher(data['password_hash'])
+			except ValueError:
+				return self.skip(number, 'unknown password_hash format')
+
+		data['is_active'] = _is_true(row.get('is_active'), default=True)
+		return data
+
+	def import_chunk(self, chunk):
+		self.read += len(chunk)
+
+		valid = []
+		for number, row in chunk:
+			data = self.validate(number, row)
+			if data is None:
+				continue
+			keys = ('email', data['email']), ('mobile', data['mobile'])
+			if any(key in self.seen for key in keys if key[1]):
+				self.skip(number, 'duplicate in file')
+				continue
+			self.seen.update(key for key in keys if key[1])
+			data['username'] = AuthUtils.get_username()
+			valid.append((number, data))
+
+		# a single query for the uniqueness of the whole chunk (and of the generated usernames)
+		emails = [data['email'] for number, data in valid]
+		mobiles = [data['mobile'] for number, data in valid if data['mobile']]
+		usernames = [data['username'] for number, data in valid]
+		taken = set()
+		for email, mobile, username in self.UserModel.objects.filter(
+				Q(email__in=emails) | Q(mobile__in=mobiles) | Q(username__in=usernames)).values_list(
+				'email', 'mobile', 'username'):
+			taken.update((('email', email), ('mobile', mobile), ('username', username)))
+
+		users, plain = [], []
+		for number, data in valid:
+			if ('email', data['email']) in taken or (data['mobile'] and ('mobile', data['mobile']) in taken):
+				self.skip(number, 'already registered')
+				continue
+			while ('username', data['username']) in taken:
+				# random username collision, rare enough for a query each
+				data['username'] = AuthUtils.get_username()
+				if self.UserModel.objects.filter(username=data['username']).exists():
+					taken.add(('username', data['username']))
+			taken.add(('username', data['username']))
+
+			user = self.UserModel(
+				username=data['username'], email=data['email'], mobile=data['mobile'],
+				first_name=data['first_name'], last_name=data['last_name'], is_active=data['is_active'],
+				password=data['password_hash'] or hashers.make_password(None),
+			)
+			if data['password'] and not data['password_hash'] and not self.dry_run:
+				plain.append((user, data['password']))
+			users.append(user)
+
+		for (user, password), encoded in zip(plain, self.executor.map(
+				hashers.make_password, [password for user, password in plain], chunksize=16)):
+			user.password = encoded
+
+		if users and not self.dry_run:
+			with transaction.atomic():
+				self.UserModel.objects.bulk_create(users)
+		self.imported += len(users)
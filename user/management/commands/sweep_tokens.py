@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from user.sweeper import sweep_expired_tokens
+
+
+class Command(BaseCommand):
+	help = 'Deletes expired auth tokens (and expired revocations of signed tokens) in batches'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--batch-size', type=int, default=1000)
+		parser.add_argument('--pause', type=float, default=0.1, help='seconds to sleep between batches')
+
+	def handle(self, *args, **options):
+		tokens, revocations, elapsed = sweep_expired_tokens(options['batch_size'], options['pause'])
+		self.stdout.write('{0} tokens, {1} revocations deleted in {2:.1f}s ({3:.0f} rows/s)'.format(
+			tokens, revocations, elapsed, (tokens + revocations) / elapsed if elapsed else 0))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+# The schema from before the app had migrations, a database created by syncdb then takes it with
+# 'manage.py migrate --fake-initial'
+
+from django.conf import settings
+import django.contrib.auth.models
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+	initial = True
+
+	dependencies = [
+		('auth', '0007_alter_validators_add_error_messages'),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name='CustomUser',
+			fields=[
+				('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('password', models.CharField(max_length=128, verbose_name='password')),
+				('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+				('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+				('username', models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 30 characters or fewer. Letters, digits and @/./+/-/_ only.', max_length=30, unique=True, validators=[django.core.validators.RegexValidator('^[\\w.@+-]+$', 'Enter a valid username. This value may contain only letters, numbers and @/./+/-/_ characters.')], verbose_name='username')),
+				('first_name', models.CharField(blank=True, max_length=30, verbose_name='first name')),
+				('last_name', models.CharField(blank=True, max_length=30, verbose_name='last name')),
+				('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+				('is_staff', models.BooleanField(default=False, help_text='Designates whether the user can log into this admin site.', verbose_name='staff status')),
+				('is_active', models.BooleanField(default=True, help_text='Designates whether this user should be treated as active. Unselect this instead of deleting accounts.', verbose_name='active')),
+				('date_joined', models.DateTimeField(default=django.utils.timezone.now, verbose_name='date joined')),
+				('mobile', models.CharField(blank=True, max_length=10)),
+				('is_email_verified', models.BooleanField(default=False)),
+				('is_mobile_verified', models.BooleanField(default=False)),
+				('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.Group', verbose_name='groups')),
+				('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.Permission', verbose_name='user permissions')),
+			],
+			options={
+				'db_table': 'user',
+			},
+			managers=[
+				('objects', django.contrib.auth.models.UserManager()),
+			],
+		),
+		migrations.CreateModel(
+			name='Token',
+			fields=[
+				('key', models.CharField(max_length=40, primary_key=True, serialize=False)),
+				('client_token', models.CharField(max_length=16, null=True)),
+				('created', models.DateTimeField(auto_now_add=True)),
+				('expiry', models.DateTimeField()),
+				('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+			],
+			options={
+				'db_table': 'token',
+			},
+		),
+		migrations.AlterUniqueTogether(
+			name='token',
+			unique_together=set([('user', 'client_token')]),
+		),
+	]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 15:55
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+	dependencies = [
+		('user', '0001_initial'),
+	]
+
+	operations = [
+		migrations.CreateModel(
+			name='Follow',
+			fields=[
+				('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+				('created_on', models.DateTimeField(auto_now_add=True)),
+			],
+			options={
+				'db_table': 'follow',
+			},
+		),
+		migrations.CreateModel(
+			name='RevokedToken',
+			fields=[
+				('token_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+				('revoked_on', models.DateTimeField(db_index=True)),
+				('expiry', models.DateTimeField(db_index=True)),
+			],
+			options={
+				'db_table': 'revoked_token',
+			},
+		),
+		migrations.AddField(
+			model_name='customuser',
+			name='follower_count',
+			field=models.PositiveIntegerField(default=0),
+		),
+		migrations.AlterField(
+			model_name='token',
+			name='expiry',
+			field=models.DateTimeField(db_index=True),
+		),
+		migrations.AddField(
+			model_name='follow',
+			name='followee',
+			field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL),
+		),
+		migrations.AddField(
+			model_name='follow',
+			name='follower',
+			field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL),
+		),
+		migrations.AlterUniqueTogether(
+			name='follow',
+			unique_together=set([('follower', 'followee')]),
+		),
+		migrations.AlterIndexTogether(
+			name='follow',
+			index_together=set([('followee', 'follower')]),
+		),
+	]
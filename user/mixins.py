@@ -3,7 +3,7 @@ from rest_framework import exceptions
 from django.utils.translation import ugettext_lazy as _
 
 from user.utils import AuthUtils
-from user.authentication import TokenAuthentication
+from user.authentication import SignedTokenAuthentication, TokenAuthentication
 from .permissions import IsAdmin, IsAuthor
 
 
@@ -55,7 +55,7 @@ class Validators:
 
 
 class AuthenticatedViewMixin(object):
-	authentication_classes = (TokenAuthentication,)
+	authentication_classes = (SignedTokenAuthentication, TokenAuthentication)
 	permission_classes = (IsAuthor,)
 
 	def get_serializer(self, *args, **kwargs):
@@ -2,13 +2,18 @@ import binascii
 import os
 from datetime import timedelta
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils import timezone
 
-from utils.models import BlankModel
+from user.tokencache import token_cache
+from user.writebuffer import write_coalescer
+from utils.cache import CacheVersions
+from utils.models import BlankModel, add_to_counter
 
 
 # Create your models here.
@@ -18,13 +23,43 @@ class CustomUser(AbstractUser):
 	mobile = models.CharField(max_length=10, blank=True)
 	is_email_verified = models.BooleanField(default=False)
 	is_mobile_verified = models.BooleanField(default=False)
+	follower_count = models.PositiveIntegerField(default=0)  # maintained by Follow.follow()/unfollow()
+
+	author_fields = ('first_name', 'last_name')  # make up the author name of cached posts/comments
 
 	class Meta:
 		db_table = 'user'
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		instance._saved_author = instance._get_author_fields()
+		return instance
+
+	def _get_author_fields(self, update_fields=None):
+		# deferred fields are left out, one loaded and saved later counts as changed
+		return {name: self.__dict__[name] for name in self.author_fields
+		        if name in self.__dict__ and (update_fields is None or name in update_fields)}
+
+	def save(self, *args, **kwargs):
+		adding = self._state.adding
+		ret = super().save(*args, **kwargs)
+
+		# Bumped only when the name changed, a new user has no posts/comments cached yet
+		saved = getattr(self, '_saved_author', {})
+		author = self._get_author_fields(kwargs.get('update_fields'))
+		if not adding and any(saved.get(name) != value for name, value in author.items()):
+			CacheVersions.bump_on_commit('authors')
+		self._saved_author = dict(saved, **author)
+		return ret
+
 	def delete_existing_tokens(self):
 		# deletes existing tokens of user or logging out user of all devices
 		Token.objects.filter(user=self).delete()
+		_invalidate_cached_tokens(user_id=self.pk)
+
+		from user.signedtokens import revoke_user_tokens  # imports this module
+		revoke_user_tokens(self.pk)
 
 	def get_author(self):
 		str = ''
@@ -66,7 +101,7 @@ class Token(BlankModel):
 	user = models.ForeignKey(settings.AUTH_USER_MODEL)
 	client_token = models.CharField(max_length=16, null=True)
 	created = models.DateTimeField(auto_now_add=True)
-	expiry = models.DateTimeField()
+	expiry = models.DateTimeField(db_index=True)  # for user.sweeper
 
 	class Meta:
 		db_table = 'token'
@@ -88,6 +123,17 @@ class Token(BlankModel):
 		self._set_expiry(30, save=save)
 		return self.key
 
+	def slide(self):
+		"""
+		Sliding expiry for a token still in use, pushes the expiry back to a full lifetime. The write is coalesced with
+		others (see user.writebuffer) unless the stored expiry is close
+		"""
+		if write_coalescer:
+			write_coalescer.extend_token(self, timezone.now() + timedelta(days=30))
+		else:
+			self.refresh()
+		return self.key
+
 	def expire(self, save=True):
 		self._set_expiry(0, save=save)
 		return None
@@ -99,4 +145,94 @@ class Token(BlankModel):
 
 	@staticmethod
 	def generate_key():
-		return binascii.hexlify(os.urandom(20)).decode()
\ No newline at end of file
+		return binascii.hexlify(os.urandom(20)).decode()
+
+
+class Follow(BlankModel):
+	"""
+	'follower' follows the posts of 'followee', see post.timeline
+	"""
+	follower = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='following')
+	followee = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='followers')
+	created_on = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		db_table = 'follow'
+		unique_together = ('follower', 'followee')  # also whom a user follows
+		index_together = (
+			('followee', 'follower'),  # followers of a user, for the fan-out
+		)
+
+	@classmethod
+	def follow(cls, follower, followee):
+		"""
+		:return: True if 'follower' now follows 'followee', False if it already did
+		"""
+		try:
+			with transaction.atomic():
+				cls.objects.create(follower=follower, followee=followee)
+				add_to_counter(CustomUser.objects.filter(pk=followee.pk), 'follower_count', 1)
+		except IntegrityError:
+			return False
+		return True
+
+	@classmethod
+	def unfollow(cls, follower, followee):
+		"""
+		:return: True if 'follower' no longer follows 'followee', False if it didn't
+		"""
+		# follower_count is decremented by uncount_follow() below, which also covers the cascade of a user's deletion
+		deleted, per_model = cls.objects.filter(follower=follower, followee=followee).delete()
+		return bool(deleted)
+
+
+class RevokedToken(BlankModel):
+	"""
+	Revoked signed tokens (see user.signedtokens), kept until the token would have expired anyway. 'token_id' is
+	USER_PREFIX + user pk for all the tokens of a user issued before 'revoked_on'
+	"""
+	USER_PREFIX = 'user:'
+
+	token_id = models.CharField(max_length=32, primary_key=True)
+	revoked_on = models.DateTimeField(db_index=True)
+	expiry = models.DateTimeField(db_index=True)
+
+	class Meta:
+		db_table = 'revoked_token'
+
+
+def _invalidate_cached_tokens(keys=(), user_id=None):
+	"""
+	Drops the tokens from the (process local) token cache now and again once committed, so that a concurrent request
+	can't cache the old row again in between
+	"""
+	def invalidate():
+		if keys:
+			token_cache.invalidate(*keys)
+		if user_id is not None:
+			token_cache.invalidate_user(user_id)
+
+	if token_cache:
+		invalidate()
+		transaction.on_commit(invalidate)
+
+
+# token save covers refresh()/expire() (and drops a pending slide()), delete covers logout (cascades included), user save covers deactivation
+
+@receiver(post_save, sender=Token, dispatch_uid='user.models.token_saved')
+@receiver(post_delete, sender=Token, dispatch_uid='user.models.token_deleted')
+def invalidate_cached_token(sender, instance, **kwargs):
+	_invalidate_cached_tokens(keys=(instance.pk,))
+	if write_coalescer:
+		write_coalescer.discard_token(Token, instance.pk)
+
+
+@receiver(post_save, sender=CustomUser, dispatch_uid='user.models.user_saved')
+@receiver(post_delete, sender=CustomUser, dispatch_uid='user.models.user_deleted')
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+	_invalidate_cached_tokens(user_id=instance.pk)
+
+
+@receiver(post_delete, sender=Follow, dispatch_uid='user.models.uncount_follow')
+def uncount_follow(sender, instance, **kwargs):
+	add_to_counter(CustomUser.objects.filter(pk=instance.followee_id), 'follower_count', -1)
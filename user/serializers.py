@@ -5,6 +5,7 @@ from django.core.validators import ValidationError
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers, exceptions
 
+from user import hashing
 from user.utils import AuthUtils
 from user.mixins import Validators
 
@@ -86,13 +87,18 @@ class SignupSerializer(Validators.EmailMixin, Validators.MobileMixin, Validators
 			is_email_verified = validated_data.get('is_email_verified', False)
 			is_mobile_verified = validated_data.get('is_mobile_verified', False)
 
+			# same as UserModel.objects.create_user() but with the password hashed in the hashing pool
 			UserModel = get_user_model()
-			user = UserModel.objects.create_user(
-				username=username, email=email, mobile=mobile, password=password,
+			user = UserModel(
+				username=username, email=UserModel.objects.normalize_email(email), mobile=mobile,
 				is_active=is_active, first_name=first_name, last_name=last_name,
 				is_email_verified=is_email_verified, is_mobile_verified=is_mobile_verified
 			)
+			user.password = hashing.make_password(password)
+			user.save()
 			return user
 
+		except hashing.HashingBusy:
+			raise
 		except Exception as e:
 			pass
@@ -0,0 +1,175 @@
+import binascii
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from user.models import RevokedToken
+
+config = getattr(settings, 'SIGNED_TOKEN', {})
+
+
+class SignedToken(object):
+	"""
+	Stateless auth token, the key is the signed (user pk, client token, issued on, expiry, token id) so verifying it
+	needs no DB access. A token can't be deleted, only revoked (see RevocationSet) until it would have expired anyway
+	"""
+	salt = 'user.signedtokens.SignedToken'
+
+	def __init__(self, user_id, client_token, issued, expiry, token_id):
+		self.user_id = user_id
+		self.client_token = client_token
+		self.issued = issued  # timestamps
+		self.expiry_timestamp = expiry
+		self.token_id = token_id
+
+	@classmethod
+	def issue(cls, user, client_token=''):
+		now = round(time.time(), 3)
+		lifetime = timedelta(days=config.get('LIFETIME_DAYS', 30)).total_seconds()
+		return cls(user.pk, client_token or '', now, int(now + lifetime), binascii.hexlify(os.urandom(8)).decode())
+
+	@classmethod
+	def load(cls, key):
+		"""
+		:raise signing.BadSignature: if 'key' wasn't issued by us or was tampered with
+		"""
+		try:
+			return cls(*signing.loads(key, salt=cls.salt))
+		except TypeError:
+			raise signing.BadSignature('malformed token')
+
+	@property
+	def key(self):
+		return signing.dumps([self.user_id, self.client_token, self.issued, self.expiry_timestamp, self.token_id],
+		                     salt=self.salt)
+
+	@property
+	def expiry(self):
+		return datetime.fromtimestamp(self.expiry_timestamp, timezone.utc)
+
+	def __str__(self):
+		return self.key
+
+	def delete(self):
+		"""
+		Revokes the token, same interface as user.models.Token for LogoutView
+		"""
+		revoke_token(self)
+
+
+class SignedTokenUser(SimpleLazyObject):
+	"""
+	request.user of a signed token, only loaded from the DB when something other than its pk is needed
+	"""
+
+	def __init__(self, pk):
+		super().__init__(lambda: get_user_model()._default_manager.get(pk=pk))
+		self.__dict__.update(pk=pk, id=pk)
+
+	def is_authenticated(self):
+		return True
+
+	def is_anonymous(self):
+		return False
+
+
+class RevocationSet(object):
+	"""
+	In memory copy of the (unexpired) RevokedToken table, refreshed from it every 'refresh' seconds so that a
+	revocation made by another process is seen within that time.
+
+	Revoked token ids are kept in a plain set, a check is a single hash lookup (a bloom filter in front of it would only
+	add hashing, the set is in memory anyway). Revocations of all of a user's tokens (logout everywhere,
+	deactivation) are kept as user pk vs. time, tokens issued before are revoked.
+	"""
+
+	def __init__(self, refresh=30):
+		self.refresh = refresh
+		self._lock = threading.Lock()
+		self._reset()
+
+	def _reset(self):
+		self.tokens = set()
+		self.users = {}
+		self.loaded_on = None  # revoked_on of the latest row loaded
+		self.next_refresh = 0
+
+	def _add(self, token_id, revoked_on):
+		if token_id.startswith(RevokedToken.USER_PREFIX):
+			user_id = int(token_id[len(RevokedToken.USER_PREFIX):])
+			self.users[user_id] = max(self.users.get(user_id, 0), revoked_on.timestamp())
+		else:
+			self.tokens.add(token_id)
+
+	def load(self):
+		"""
+		Loads the revocations made since the last load, all unexpired ones the first time
+		"""
+		with self._lock:
+			queryset = RevokedToken.objects.filter(expiry__gt=timezone.now())
+			if self.loaded_on is not None:
+				# overlap by a refresh period, rows committed late may carry an earlier revoked_on
+				queryset = queryset.filter(revoked_on__gte=self.loaded_on - timedelta(seconds=self.refresh * 2))
+
+			for token_id, revoked_on in queryset.values_list('token_id', 'revoked_on').iterator():
+				self._add(token_id, revoked_on)
+				if self.loaded_on is None or revoked_on > self.loaded_on:
+					self.loaded_on = revoked_on
+			if self.loaded_on is None:
+				self.loaded_on = timezone.now()
+			self.next_refresh = time.monotonic() + self.refresh
+
+	def add(self, token_id, revoked_on):
+		with self._lock:
+			self._add(token_id, revoked_on)
+
+	def is_revoked(self, token):
+		if time.monotonic() >= self.next_refresh:
+			self.load()
+
+		revoked_before = self.users.get(token.user_id)
+		if revoked_before is not None and token.issued <= revoked_before:
+			return True
+		return token.token_id in self.tokens
+
+
+revocations = RevocationSet(refresh=config.get('REFRESH', 30))
+
+
+def _revoke(token_id, expiry):
+	now = timezone.now()
+	RevokedToken.objects.update_or_create(token_id=token_id, defaults={'revoked_on': now, 'expiry': expiry})
+	transaction.on_commit(lambda: revocations.add(token_id, now))
+
+
+def revoke_token(token):
+	_revoke(token.token_id, token.expiry)
+
+
+def revoke_user_tokens(user_id):
+	"""
+	Revokes all signed tokens issued to the user so far
+	"""
+	lifetime = timedelta(days=config.get('LIFETIME_DAYS', 30))
+	_revoke(RevokedToken.USER_PREFIX + str(user_id), timezone.now() + lifetime)
+
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid='user.signedtokens.user_saved')
+def revoke_deactivated_user_tokens(sender, instance, created, **kwargs):
+	if not created and not instance.is_active:
+		revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model(), dispatch_uid='user.signedtokens.user_deleted')
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+	revoke_user_tokens(instance.pk)
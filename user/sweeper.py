@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from user.models import Token, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+def _sweep(model, batch_size, pause):
+	"""
+	Deletes the rows of 'model' whose expiry has passed, 'batch_size' rows per DELETE (each its own short transaction)
+	sleeping 'pause' seconds in between so that other writers are never locked out for long
+	:return: no. of rows deleted
+	"""
+	now = timezone.now()
+	deleted = 0
+	while True:
+		pks = list(model.objects.filter(expiry__lt=now).order_by('expiry').values_list('pk', flat=True)[:batch_size])
+		if not pks:
+			return deleted
+
+		# expiry re-checked, the token may have been refreshed since
+		count, per_model = model.objects.filter(pk__in=pks, expiry__lt=now).delete()
+		deleted += count
+		if len(pks) < batch_size:
+			return deleted
+		time.sleep(pause)
+
+
+def sweep_expired_tokens(batch_size=1000, pause=0.1):
+	"""
+	Deletes expired auth tokens, and revocations of signed tokens which have expired anyway
+	:return: (tokens deleted, revocations deleted, seconds taken)
+	"""
+	start = time.time()
+	tokens = _sweep(Token, batch_size, pause)
+	revocations = _sweep(RevokedToken, batch_size, pause)
+	return tokens, revocations, time.time() - start
+
+
+class TokenSweeper(threading.Thread):
+	"""
+	Runs sweep_expired_tokens() every 'interval' seconds in the background, see settings.TOKEN_SWEEPER
+	"""
+
+	def __init__(self, interval=3600, batch_size=1000, pause=0.1):
+		super().__init__(name='token-sweeper', daemon=True)
+		self.interval = interval
+		self.batch_size = batch_size
+		self.pause = pause
+		self.stopped = threading.Event()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			try:
+				tokens, revocations, elapsed = sweep_expired_tokens(self.batch_size, self.pause)
+				logger.info('token sweep: %d tokens, %d revocations deleted in %.1fs', tokens, revocations, elapsed)
+			except Exception:
+				logger.exception('token sweep failed')
+			finally:
+				# this thread's own connection, don't keep it open until the next run
+				connection.close()
+
+	def stop(self):
+		self.stopped.set()
+
+
+_sweeper = None
+
+
+def start_sweeper():
+	"""
+	Starts the background sweeper (once per process) if enabled in settings.TOKEN_SWEEPER
+	"""
+	global _sweeper
+	config = getattr(settings, 'TOKEN_SWEEPER', {})
+	if _sweeper is None and config.get('ENABLED', False):
+		_sweeper = TokenSweeper(interval=config.get('INTERVAL', 3600), batch_size=config.get('BATCH_SIZE', 1000),
+		                        pause=config.get('PAUSE', 0.1))
+		_sweeper.start()
+	return _sweeper
@@ -1,3 +1,158 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from user.authentication import SignedTokenAuthentication
+from user.models import Follow
+from user.signedtokens import SignedToken, RevocationSet, revocations
+from user.writebuffer import WriteCoalescer
+from utils.cache import CacheVersions
+from utils.querybudget import query_budget
+
+
+def create_user(name, **kwargs):
+	return get_user_model().objects.create_user(username=name, email=name + '@example.com', password='password123',
+	                                            first_name=name, last_name='Test', **kwargs)
+
+
+@override_settings(AUTH_TOKEN_MODE='signed')
+class SignedTokenTests(APITransactionTestCase):
+	"""
+	Revocations are applied once the write commits, hence a transaction test case
+	"""
+
+	def setUp(self):
+		self.user = create_user('signed')
+
+	def login(self):
+		response = self.client.post(reverse('login'), {'username': 'signed', 'password': 'password123'}, format='json')
+		self.assertEqual(response.status_code, 200)
+		return response.data['token']
+
+	def create_post(self, key):
+		self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+		return self.client.post(reverse('post-list'), {'title': 'title', 'desc': 'desc'}, format='json').status_code
+
+	def test_login(self):
+		key = self.login()
+		token = SignedToken.load(key)
+		self.assertEqual(token.user_id, self.user.pk)
+		self.assertEqual(self.create_post(key), 201)
+
+	def test_authentication_needs_no_query(self):
+		key = self.login()
+		revocations.load()
+		with query_budget(0, 'signed token authentication'):
+			user, token = SignedTokenAuthentication().authenticate_credentials(key)
+		self.assertEqual(user.pk, self.user.pk)
+
+	def test_tampered(self):
+		key = self.login()
+		tampered = key[:-1] + ('a' if key[-1] != 'a' else 'b')
+		self.assertEqual(self.create_post(tampered), 401)
+
+	def test_logout(self):
+		key, other_key = self.login(), self.login()
+		self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+		self.assertEqual(self.client.post(reverse('logout')).status_code, 200)
+
+		self.assertEqual(self.create_post(key), 401)
+		self.assertEqual(self.create_post(other_key), 201)
+
+		# seen by the other processes once they reload
+		other_process = RevocationSet()
+		other_process.load()
+		self.assertTrue(other_process.is_revoked(SignedToken.load(key)))
+		self.assertFalse(other_process.is_revoked(SignedToken.load(other_key)))
+
+	def test_deactivation(self):
+		key = self.login()
+		self.user.is_active = False
+		self.user.save()
+		self.assertEqual(self.create_post(key), 401)
+
+	def test_revoked_among_many(self):
+		keys = [SignedToken.issue(self.user).key for i in range(50)]
+		for key in keys[::2]:
+			SignedToken.load(key).delete()
+		self.assertEqual([revocations.is_revoked(SignedToken.load(key)) for key in keys], [True, False] * 25)
+
+
+class AuthorVersionTests(APITransactionTestCase):
+	"""
+	The 'authors' version is bumped once the write commits, hence a transaction test case
+	"""
+
+	def setUp(self):
+		self.user = create_user('author')
+
+	def version(self):
+		return CacheVersions.get_many(['authors'])[0]
+
+	def test_rename(self):
+		version = self.version()
+		self.user.last_name = 'renamed'
+		self.user.save()
+		self.assertEqual(self.version(), version + 1)
+
+		user = get_user_model().objects.get(pk=self.user.pk)
+		user.first_name = 'renamed'
+		user.save(update_fields=['first_name'])
+		self.assertEqual(self.version(), version + 2)
+
+	def test_other_changes(self):
+		version = self.version()
+		self.user.is_email_verified = True
+		self.user.save()
+		create_user('other')
+
+		user = get_user_model().objects.get(pk=self.user.pk)
+		user.mobile = '9999999999'
+		user.save()
+		user.first_name = 'renamed'
+		user.save(update_fields=['mobile'])
+
+		user = get_user_model().objects.only('mobile').get(pk=self.user.pk)
+		user.save()
+		self.assertEqual(self.version(), version)
+
+
+class FollowTests(APITestCase):
+	def setUp(self):
+		self.follower, self.followee = create_user('follower'), create_user('followee')
+
+	def follower_count(self):
+		return get_user_model().objects.get(pk=self.followee.pk).follower_count
+
+	def test_follow(self):
+		self.assertTrue(Follow.follow(self.follower, self.followee))
+		self.assertFalse(Follow.follow(self.follower, self.followee))
+		self.assertEqual(self.follower_count(), 1)
+
+		self.assertTrue(Follow.unfollow(self.follower, self.followee))
+		self.assertFalse(Follow.unfollow(self.follower, self.followee))
+		self.assertEqual(self.follower_count(), 0)
+
+	def test_count_never_negative(self):
+		Follow.follow(self.follower, self.followee)
+		get_user_model().objects.filter(pk=self.followee.pk).update(follower_count=0)  # drifted
+		Follow.unfollow(self.follower, self.followee)
+		self.assertEqual(self.follower_count(), 0)
+
+
+class WriteCoalescerTests(TestCase):
+	def timers(self, coalescer):
+		return [thread for thread in threading.enumerate() if getattr(thread, 'coalescer', None) is coalescer]
+
+	def test_timer_started_by_first_write(self):
+		coalescer = WriteCoalescer(interval=60)
+		self.addCleanup(coalescer.stop_timer)
+		self.assertEqual(self.timers(coalescer), [])
+
+		user = create_user('writer')
+		coalescer.set_last_login(user)
+		coalescer.set_last_login(user)
+		self.assertEqual(len(self.timers(coalescer)), 1)
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def _snapshot(instance):
+	model = instance._meta.concrete_model
+	names = [field.attname for field in model._meta.concrete_fields]
+	return model, names, tuple(getattr(instance, name) for name in names)
+
+
+def _restore(snapshot, db):
+	model, names, values = snapshot
+	return model.from_db(db, names, values)
+
+
+class TokenCache:
+	"""
+	Process local LRU cache of auth tokens (key -> token and its user, as loaded from the DB) for TokenAuthentication,
+	entries live at most 'ttl' seconds.
+
+	Tokens and users are kept as field value snapshots and every get() builds fresh instances from them, so requests
+	never share (and mutate) the same objects. Entries are invalidated on token save/delete and on user save (see
+	user.models) - but only in this process, other processes can keep serving an entry for up to 'ttl' seconds, so
+	keep it short.
+	"""
+
+	def __init__(self, max_size=10000, ttl=60):
+		self.max_size = max_size
+		self.ttl = ttl
+		self._entries = OrderedDict()  # key vs. (expires at, db, token snapshot, user snapshot, user pk)
+		self._user_keys = {}  # user pk vs. set of keys
+		self._lock = threading.Lock()
+		self.hits = self.misses = self.evictions = 0
+		self.invalidations = 0
+
+	def get(self, key):
+		"""
+		:return: token with its user or None if not cached
+		"""
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None or entry[0] <= now:
+				if entry is not None:
+					self._remove(key)
+				self.misses += 1
+				return None
+			self._entries.move_to_end(key)
+			self.hits += 1
+
+		expires_at, db, token, user, user_id = entry
+		token = _restore(token, db)
+		token.user = _restore(user, db)
+		return token
+
+	def set(self, token, since=None):
+		"""
+		:param since: value of 'invalidations' from before 'token' was read from the DB, the token isn't cached if
+		  anything got invalidated since then (it may have been read just before being changed)
+		"""
+		entry = (time.monotonic() + self.ttl, token._state.db, _snapshot(token), _snapshot(token.user), token.user_id)
+		with self._lock:
+			if since is not None and since != self.invalidations:
+				return
+			self._remove(token.pk)
+			self._entries[token.pk] = entry
+			self._user_keys.setdefault(token.user_id, set()).add(token.pk)
+			while len(self._entries) > self.max_size:
+				self._remove(next(iter(self._entries)))
+				self.evictions += 1
+
+	def invalidate(self, *keys):
+		with self._lock:
+			self.invalidations += 1
+			for key in keys:
+				self._remove(key)
+
+	def invalidate_user(self, user_id):
+		with self._lock:
+			self.invalidations += 1
+			for key in list(self._user_keys.get(user_id, ())):
+				self._remove(key)
+
+	def clear(self):
+		with self._lock:
+			self.invalidations += 1
+			self._entries.clear()
+			self._user_keys.clear()
+
+	def stats(self):
+		return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+	def _remove(self, key):
+		entry = self._entries.pop(key, None)
+		if entry is not None:
+			user_id = entry[4]
+			keys = self._user_keys.get(user_id)
+			if keys is not None:
+				keys.discard(key)
+				if not keys:
+					del self._user_keys[user_id]
+
+
+def _create_token_cache():
+	config = getattr(settings, 'TOKEN_CACHE', {})
+	if not config.get('ENABLED', True):
+		return None
+	return TokenCache(max_size=config.get('MAX_SIZE', 10000), ttl=config.get('TTL', 60))
+
+
+token_cache = _create_token_cache()
@@ -1,9 +1,10 @@
 from django.conf.urls import url
 
-from user.views import SignupView, LoginView, LogoutView
+from user.views import SignupView, LoginView, LogoutView, FollowView
 
 urlpatterns = [
 	url(r'^login/$', LoginView.as_view(), name='login'),
 	url(r'^logout/$', LogoutView.as_view(), name='logout'),
 	url(r'^signup/$', SignupView.as_view(), name='signup'),
+	url(r'^(?P<pk>[0-9]+)/follow/$', FollowView.as_view(), name='follow'),
 ]
@@ -1,6 +1,7 @@
 import logging
 import re
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import EmailValidator, RegexValidator
@@ -10,6 +11,9 @@ from django.utils.translation import ugettext_lazy as _
 
 from rest_framework import serializers, exceptions, status
 
+from user.models import Token
+from user.signedtokens import SignedToken
+
 logger = logging.getLogger(__name__)
 
 validate_email = EmailValidator(_('invalid email id'), status.HTTP_400_BAD_REQUEST)
@@ -102,6 +106,25 @@ class AuthUtils:
 	def is_token_valid(token):
 		return timezone.now().__lt__(token.expiry)
 
+	@staticmethod
+	def get_auth_token(user, client_token):
+		"""
+		:return: auth token key for the user's device, a user.models.Token (refreshed if expired, its expiry slid
+		  otherwise) or a new signed
+		  token (user.signedtokens) as per settings.AUTH_TOKEN_MODE
+		"""
+		if getattr(settings, 'AUTH_TOKEN_MODE', 'db') == 'signed':
+			return SignedToken.issue(user, client_token).key
+
+		token, created = Token.objects.get_or_create(user=user, client_token=client_token)
+		if not created:
+			if not AuthUtils.is_token_valid(token):
+				# Token expired, refresh it..
+				token.refresh()
+			else:
+				token.slide()
+		return token.key
+
 	@staticmethod
 	def db_table_name(table):
 		return 'auth_' + table
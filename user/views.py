@@ -4,15 +4,17 @@ import django.dispatch
 from django.contrib.auth import get_user_model
 from django.contrib.auth import user_logged_in
 from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.translation import ugettext_lazy as _
 from rest_framework import status, views
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework import mixins
 from rest_framework import generics
 
 from user.utils import AuthUtils
 from user.mixins import AuthenticatedViewMixin
-from user.models import Token
+from user.models import Token, Follow
 from user.serializers import LoginSerializer, SignupSerializer
 
 user_signed_up = django.dispatch.Signal(providing_args=["user", "request",])
@@ -28,15 +30,10 @@ class LoginView(mixins.CreateModelMixin, generics.GenericAPIView):
 		serializer = self.get_serializer(data=request.data)
 		serializer.is_valid(raise_exception=True)
 		user = serializer.validated_data['user']
-		client_token = AuthUtils.get_client_token(self.request)
-		token, created = Token.objects.get_or_create(user=user, client_token=client_token)
-		if not created:
-			if not AuthUtils.is_token_valid(token):
-				# Token expired, refresh it..
-				token.refresh()
+		key = AuthUtils.get_auth_token(user, AuthUtils.get_client_token(self.request))
 
 		user_logged_in.send(sender=user.__class__, request=self.request, user=user)
-		return Response({'token': token.key}, status=status.HTTP_200_OK)
+		return Response({'token': key}, status=status.HTTP_200_OK)
 
 
 class LogoutView(AuthenticatedViewMixin, views.APIView):
@@ -76,5 +73,25 @@ class SignupView(mixins.CreateModelMixin, generics.GenericAPIView):
 			if user:
 				user_signed_up.send(sender=user.__class__, user=user, request=self.request)
 
-		token = Token.objects.create(user=user, client_token=AuthUtils.get_client_token(self.request))
-		return Response(data={'token': token.key}, status=status.HTTP_201_CREATED)
+		key = AuthUtils.get_auth_token(user, AuthUtils.get_client_token(self.request))
+		return Response(data={'token': key}, status=status.HTTP_201_CREATED)
+
+
+class FollowView(AuthenticatedViewMixin, views.APIView):
+	"""
+	Follows (POST) or unfollows (DELETE) the user, their posts show up in the home timeline (/post/timeline/)
+	"""
+
+	def get_followee(self):
+		followee = get_object_or_404(get_user_model(), pk=self.kwargs['pk'], is_active=True)
+		if followee.pk == self.request.user.pk:
+			raise ValidationError({'detail': _('cannot follow yourself')})
+		return followee
+
+	def post(self, request, *args, **kwargs):
+		created = Follow.follow(request.user, self.get_followee())
+		return Response({'following': True}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+	def delete(self, request, *args, **kwargs):
+		Follow.unfollow(request.user, self.get_followee())
+		return Response({'following': False}, status=status.HTTP_200_OK)
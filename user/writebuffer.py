@@ -0,0 +1,170 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection
+from django.db.models import Case, When, Value, F, DateTimeField, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer(object):
+	"""
+	Buffers token expiry extensions and last_login timestamps and writes them in batches, one UPDATE per 'batch_size'
+	rows, once 'interval' seconds have passed since the last flush or 'max_pending' writes are waiting - checked on each
+	write and by a FlushTimer thread, so that a quiet process doesn't hold them back until its next write. The thread
+	is started by the first buffered write in each process, a process that never buffers one (management commands, a
+	preforking server's master) doesn't run it.
+
+	Expiry checks stay correct because an extension is only buffered when the stored expiry is still at least 'margin'
+	away, so every process keeps seeing a valid token until the write lands. Each buffered extension is written as a
+	compare-and-set on the expiry it was based on, so it never revives a token expired (or changed) meanwhile.
+	"""
+
+	def __init__(self, interval=5, max_pending=500, margin=3600, batch_size=500):
+		self.interval = interval
+		self.max_pending = max_pending
+		self.margin = timedelta(seconds=margin)
+		self.batch_size = batch_size
+		self._tokens = {}  # (model, key) vs. (stored expiry, new expiry)
+		self._logins = {}  # user pk vs. last login
+		self._lock = threading.Lock()
+		self._flushed_at = time.monotonic()
+		self._timer = None
+
+	def extend_token(self, token, expiry):
+		"""
+		Sets token.expiry to 'expiry', the write is deferred unless the stored expiry is about to pass
+		"""
+		stored = token.expiry
+		token.expiry = expiry
+		if stored is None or stored - timezone.now() < self.margin:
+			token.save(update_fields=['expiry'])
+			return
+
+		with self._lock:
+			key = (type(token)._meta.concrete_model, token.pk)
+			if key in self._tokens:
+				stored = self._tokens[key][0]
+			self._tokens[key] = (stored, expiry)
+		self._start_timer()
+		self._flush_if_due()
+
+	def set_last_login(self, user, when=None):
+		user.last_login = when or timezone.now()
+		with self._lock:
+			self._logins[user.pk] = user.last_login
+		self._start_timer()
+		self._flush_if_due()
+
+	def discard_token(self, model, key):
+		with self._lock:
+			self._tokens.pop((model._meta.concrete_model, key), None)
+
+	def _start_timer(self):
+		# a forked process doesn't inherit the parent's thread, it starts its own
+		timer = self._timer
+		if timer is None or timer.pid != os.getpid():
+			with self._lock:
+				if self._timer is timer:
+					self._timer = FlushTimer(self, interval=self.interval)
+					self._timer.start()
+
+	def stop_timer(self):
+		if self._timer is not None:
+			self._timer.stop()
+
+	def pending(self):
+		return len(self._tokens) + len(self._logins)
+
+	def _flush_if_due(self):
+		if self.pending() >= self.max_pending or time.monotonic() - self._flushed_at >= self.interval:
+			self.flush()
+
+	def flush(self):
+		with self._lock:
+			tokens, self._tokens = self._tokens, {}
+			logins, self._logins = self._logins, {}
+			self._flushed_at = time.monotonic()
+
+		by_model = {}
+		for (model, key), expiries in tokens.items():
+			by_model.setdefault(model, []).append((key, expiries))
+
+		try:
+			for model, rows in by_model.items():
+				for i in range(0, len(rows), self.batch_size):
+					batch = rows[i:i + self.batch_size]
+					model._default_manager.filter(pk__in=[key for key, expiries in batch]).update(expiry=Case(
+						*[When(pk=key, expiry=stored, then=Value(expiry)) for key, (stored, expiry) in batch],
+						default=F('expiry'), output_field=DateTimeField()))
+
+			rows = list(logins.items())
+			for i in range(0, len(rows), self.batch_size):
+				batch = rows[i:i + self.batch_size]
+				get_user_model()._default_manager.filter(pk__in=[pk for pk, when in batch]).update(last_login=Case(
+					*[When(Q(pk=pk) & (Q(last_login__isnull=True) | Q(last_login__lt=when)), then=Value(when))
+					  for pk, when in batch],
+					default=F('last_login'), output_field=DateTimeField()))
+		except DatabaseError:
+			# losing a few expiry extensions/last_login updates is harmless, they are redone on next login
+			logger.exception('write coalescer flush failed, %d token(s) and %d login(s) dropped', len(tokens),
+			                 len(logins))
+
+
+class FlushTimer(threading.Thread):
+	"""
+	Flushes the pending writes of 'coalescer' every 'interval' seconds in the background
+	"""
+
+	def __init__(self, coalescer, interval=5):
+		super().__init__(name='write-coalescer-flush', daemon=True)
+		self.coalescer = coalescer
+		self.interval = interval
+		self.pid = os.getpid()
+		self.stopped = threading.Event()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			if not self.coalescer.pending():
+				continue
+			try:
+				self.coalescer.flush()
+			except Exception:
+				logger.exception('write coalescer flush failed')
+			finally:
+				# this thread's own connection, don't keep it open until the next flush
+				connection.close()
+
+	def stop(self):
+		self.stopped.set()
+
+
+def _create_write_coalescer():
+	config = getattr(settings, 'WRITE_COALESCING', {})
+	if not config.get('ENABLED', True):
+		return None
+	return WriteCoalescer(interval=config.get('INTERVAL', 5), max_pending=config.get('MAX_PENDING', 500),
+	                      margin=config.get('MARGIN', 3600))
+
+
+write_coalescer = _create_write_coalescer()
+
+if write_coalescer:
+	atexit.register(write_coalescer.flush)
+
+def update_last_login(sender, user, **kwargs):
+	"""
+	Replaces django.contrib.auth's own 'user_logged_in' receiver (a save() per login), see user.apps
+	"""
+	if write_coalescer:
+		write_coalescer.set_last_login(user)
+	else:
+		user.last_login = timezone.now()
+		user.save(update_fields=['last_login'])
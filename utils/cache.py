@@ -0,0 +1,83 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+
+def get_cache():
+	return caches[getattr(settings, 'RESPONSE_CACHE', {}).get('CACHE', 'default')]
+
+
+class CacheVersions:
+	"""
+	Named version counters, a cache entry built from some data includes the versions of that data in its key so
+	invalidating all of them is a single increment - entries under the old versions are simply never read again
+	(and expire on their own).
+
+	A counter that is missing (never set, or evicted) restarts from the current time in ms rather than 1, so that
+	it can't come back to a value some stale entry is still keyed on.
+	"""
+	prefix = 'version:'
+
+	@staticmethod
+	def _initial():
+		return int(time.time() * 1000)
+
+	@staticmethod
+	def get_many(names):
+		cache = get_cache()
+		keys = [CacheVersions.prefix + name for name in names]
+		versions = cache.get_many(keys)
+
+		missing = {key: CacheVersions._initial() for key in keys if key not in versions}
+		if missing:
+			for key, value in missing.items():
+				cache.add(key, value, None)
+			versions.update(cache.get_many(list(missing.keys())))
+
+		return [versions.get(key, 0) for key in keys]
+
+	@staticmethod
+	def bump(*names):
+		cache = get_cache()
+		for name in names:
+			key = CacheVersions.prefix + name
+			try:
+				cache.incr(key)
+			except ValueError:
+				# missing, (re)start it
+				cache.add(key, CacheVersions._initial(), None)
+
+	@staticmethod
+	def bump_on_commit(*names):
+		# Bumping before the commit would let a concurrent reader cache the old data under the new version
+		transaction.on_commit(lambda: CacheVersions.bump(*names))
+
+
+def make_key(prefix, *parts):
+	digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+	return '{0}:{1}'.format(prefix, digest)
+
+
+class CacheVersionedMixin(object):
+	"""
+	Model mixin, bumps the CacheVersions named by get_cache_versions() whenever an object is saved or deleted
+	"""
+
+	def get_cache_versions(self):
+		return ()
+
+	def save(self, *args, **kwargs):
+		ret = super().save(*args, **kwargs)
+		CacheVersions.bump_on_commit(*self.get_cache_versions())
+		return ret
+
+
+@receiver(post_delete, dispatch_uid='utils.cache.bump_cache_versions')
+def bump_cache_versions(sender, instance, **kwargs):
+	if isinstance(instance, CacheVersionedMixin):
+		CacheVersions.bump_on_commit(*instance.get_cache_versions())
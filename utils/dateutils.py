@@ -1,4 +1,5 @@
-from datetime import timedelta
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 import pytz
 from django.utils import timezone
@@ -42,6 +43,49 @@ def date_in_ist(utc_datetime=None):
 	return utc_to_ist(utc_datetime).date()
 
 
+def ist_day_start(date):
+	"""
+	:return: (aware, UTC) datetime at which 'date' begins in IST
+	"""
+	return IST.localize(datetime.combine(date, datetime.min.time())).astimezone(pytz.utc)
+
+
+def ist_datetime_range(date_range):
+	"""
+	:param date_range: DateRange of dates (both ends included) in IST, or a single date
+	:return: (start, end) UTC datetimes, the half-open [start, end) interval covering those IST days - to filter a
+	  DateTimeField with __gte/__lt which (unlike __contains/__date) can be served from an index on it
+	"""
+	if not isinstance(date_range, DateRange):
+		date_range = DateRange(date_range, date_range)
+	return ist_day_start(date_range.start), ist_day_start(date_range.end + timedelta(days=1))
+
+
+def _month_start(date):
+	return date.replace(day=1)
+
+
+# Named ranges of IST days, name vs. function (today) returning the DateRange
+NAMED_DATE_RANGES = OrderedDict((
+	('today', lambda today: DateRange(today, today)),
+	('yesterday', lambda today: DateRange(today - timedelta(days=1), today - timedelta(days=1))),
+	('last_7_days', lambda today: DateRange(today - timedelta(days=6), today)),
+	('last_30_days', lambda today: DateRange(today - timedelta(days=29), today)),
+	('this_month', lambda today: DateRange(_month_start(today), today)),
+	('last_month', lambda today: DateRange(_month_start(_month_start(today) - timedelta(days=1)),
+	                                       _month_start(today) - timedelta(days=1))),
+))
+
+
+def named_date_range(name, today=None):
+	"""
+	:param name: one of NAMED_DATE_RANGES
+	:param today: defaults to today in IST
+	:return: DateRange of the days (in IST)
+	"""
+	return NAMED_DATE_RANGES[name](today or date_in_ist())
+
+
 def time_is_future(time, days=0, hours=0, minutes=0, seconds=0, milliseconds=1, ref_time=None):
 	if not time:
 		return False
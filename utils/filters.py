@@ -1,25 +1,64 @@
 import datetime
 import rest_framework_filters as filters
 
-# from utils import dateutils
+from utils import dateutils
+
+
+class ISTDateFilter(filters.DateFilter):
+	"""
+	Matches a DateTimeField on a date in IST, as a range of (UTC) datetimes instead of a per row date extraction so
+	that an index on the field is used
+	"""
+
+	def filter(self, qs, value):
+		if value in ([], (), {}, None, ''):
+			return qs
+		return self.filter_range(qs, dateutils.ist_datetime_range(value))
+
+	def filter_range(self, qs, datetime_range):
+		start, end = datetime_range
+		qs = self.get_method(qs)(**{self.name + '__gte': start, self.name + '__lt': end})
+		return qs.distinct() if self.distinct else qs
+
+
+class ISTDateRangeFilter(ISTDateFilter):
+	"""
+	Matches a DateTimeField on a named range of days in IST (see dateutils.NAMED_DATE_RANGES) e.g. 'last_7_days'
+	"""
+	field_class = filters.ChoiceFilter.field_class
+
+	def __init__(self, *args, **kwargs):
+		kwargs.setdefault('choices', [(name, name) for name in dateutils.NAMED_DATE_RANGES])
+		super().__init__(*args, **kwargs)
+
+	def filter(self, qs, value):
+		if value in ([], (), {}, None, ''):
+			return qs
+		return self.filter_range(qs, dateutils.ist_datetime_range(dateutils.named_date_range(value)))
 
 
 def add_date_filtering(cls):
 	"""
 	Adds date-filtering to filtering-class 'cls'.
-	Fields provided to cls.Meta.date_fields are given date-filtering for =, __lte, __gte
-	Fields provided to cls.Meta.date_range_fields are given DTR date-range-filtering for options like: Today, Last 7 Days
+	Fields provided to cls.Meta.date_fields are given date-filtering for =, __lte, __gte, with '=' matching the date
+	in IST
+	Fields provided to cls.Meta.date_range_fields are given '__range' filtering on named ranges of IST days like
+	today, last_7_days, this_month (see dateutils.NAMED_DATE_RANGES)
+	All of them filter the field with >= and/or < so an index on it serves them
 	:param cls: Filtering class
 	"""
-	if hasattr(cls.Meta, 'date_fields'):
-		for field in cls.Meta.date_fields:
-			filter_update = {
-				field: filters.DateFilter(name=field, lookup_type='contains'),
-				field + '__lte': filters.DateTimeFilter(name=field, lookup_type='lte'),
-				field + '__gte': filters.DateTimeFilter(name=field, lookup_type='gte')
-			}
-			cls.declared_filters.update(filter_update)
-			cls.base_filters.update(filter_update)
+	filter_update = {}
+	for field in getattr(cls.Meta, 'date_fields', ()):
+		filter_update.update({
+			field: ISTDateFilter(name=field),
+			field + '__lte': filters.DateTimeFilter(name=field, lookup_type='lte'),
+			field + '__gte': filters.DateTimeFilter(name=field, lookup_type='gte')
+		})
+	for field in getattr(cls.Meta, 'date_range_fields', ()):
+		filter_update[field + '__range'] = ISTDateRangeFilter(name=field)
+
+	cls.declared_filters.update(filter_update)
+	cls.base_filters.update(filter_update)
 
 
 # class DateTimeFilter(object):
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 
 class BlankModel(models.Model):
@@ -9,4 +10,14 @@ class BlankModel(models.Model):
 		s = "[" + super().__str__() + "]: " if settings.DEBUG else ""
 		if hasattr(self, 'name'):
 			return s + str(self.pk) + ", " + self.name
-		return s + 'id' + "=" + str(self.pk)
\ No newline at end of file
+		return s + 'id' + "=" + str(self.pk)
+
+
+def add_to_counter(queryset, field, delta):
+	"""
+	Atomically adds 'delta' to the denormalized counter 'field' of the rows of 'queryset'
+	"""
+	if delta < 0:
+		# Never go below 0 (unsigned column), drift if any is for a recount (e.g. 'manage.py recount_comments') to fix
+		queryset = queryset.filter(**{field + '__gte': -delta})
+	queryset.update(**{field: F(field) + delta})
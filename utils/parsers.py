@@ -0,0 +1,33 @@
+import json
+
+from django.conf import settings
+from django.utils import six
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+	"""
+	Newline delimited JSON, one object per line. request.data is a generator reading the body line by line as it
+	is consumed, so a large upload is never held in memory as a whole. A line that isn't valid JSON comes out as a
+	ParseError instance (instead of aborting the whole stream) so that the view can report it against that item
+	"""
+	media_type = 'application/x-ndjson'
+
+	def parse(self, stream, media_type=None, parser_context=None):
+		parser_context = parser_context or {}
+		encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+		def items():
+			if stream is None:
+				return
+			for number, line in enumerate(stream, 1):
+				line = line.decode(encoding) if isinstance(line, six.binary_type) else line
+				if not line.strip():
+					continue
+				try:
+					yield json.loads(line)
+				except ValueError as e:
+					yield ParseError('line {0}: {1}'.format(number, six.text_type(e)))
+
+		return items()
@@ -0,0 +1,107 @@
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+	pass
+
+
+def _budget_settings():
+	return getattr(settings, 'QUERY_BUDGET', {})
+
+
+def _query_count():
+	return sum(len(connection.queries_log) for connection in connections.all())
+
+
+def _force_debug_cursor(value):
+	previous = [connection.force_debug_cursor for connection in connections.all()]
+	for connection in connections.all():
+		connection.force_debug_cursor = value
+	return previous
+
+
+def _restore_debug_cursor(previous):
+	for connection, value in zip(connections.all(), previous):
+		connection.force_debug_cursor = value
+
+
+def _queries_since(start_counts):
+	queries = []
+	for connection, start in zip(connections.all(), start_counts):
+		queries.extend(q['sql'] for q in list(connection.queries_log)[start:])
+	return queries
+
+
+@contextmanager
+def query_budget(max_queries, label='block'):
+	"""
+	Test-time guard, fails with QueryBudgetExceeded if the wrapped block runs more than 'max_queries' queries
+
+		with query_budget(3, 'post-list'):
+			self.client.get('/post/posts/?page-size=1000')
+	"""
+	previous = _force_debug_cursor(True)
+	start_counts = [len(connection.queries_log) for connection in connections.all()]
+	try:
+		yield
+		queries = _queries_since(start_counts)
+		if len(queries) > max_queries:
+			raise QueryBudgetExceeded('{0} ran {1} queries, budget is {2}:\n{3}'.format(
+				label, len(queries), max_queries, '\n'.join(queries)))
+	finally:
+		_restore_debug_cursor(previous)
+
+
+class QueryBudgetMiddleware(object):
+	"""
+	Optional runtime guard, counts the queries run by each request and logs (or raises, see settings.QUERY_BUDGET)
+	when a request goes over budget. The budget is settings.QUERY_BUDGET['DEFAULT'] unless the (DRF) view
+	declares its own via a 'query_budget' class attribute. Only reads are checked unless settings.QUERY_BUDGET['METHODS']
+	says otherwise, writes legitimately vary (counters, search index, etc.)
+
+	Counting needs the debug cursor, which keeps the sql of each query around for the duration of the request,
+	so it is meant for test/staging runs or sampling rather than always-on in production.
+	"""
+
+	def process_request(self, request):
+		budget_settings = _budget_settings()
+		if not budget_settings.get('ENABLED', False):
+			return None
+		if request.method not in budget_settings.get('METHODS', ('GET', 'HEAD')):
+			return None
+
+		# 'request_started' has already reset the connection logs for this request, see db.reset_queries
+		request._query_budget_state = (_force_debug_cursor(True), _query_count())
+		request._query_budget = _budget_settings().get('DEFAULT')
+		return None
+
+	def process_view(self, request, view_func, view_args, view_kwargs):
+		if hasattr(request, '_query_budget_state'):
+			view_class = getattr(view_func, 'cls', None)
+			request._query_budget = getattr(view_class, 'query_budget', request._query_budget)
+		return None
+
+	def process_response(self, request, response):
+		state = getattr(request, '_query_budget_state', None)
+		if state is None:
+			return response
+
+		previous, start = state
+		del request._query_budget_state
+		count = _query_count() - start
+		_restore_debug_cursor(previous)
+
+		budget = request._query_budget
+		if budget is not None and count > budget:
+			message = '{0} {1} ran {2} queries, budget is {3}'.format(request.method, request.path, count, budget)
+			if _budget_settings().get('RAISE', False):
+				raise QueryBudgetExceeded(message)
+			logger.warning(message)
+
+		return response
@@ -0,0 +1,93 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.compat import SHORT_SEPARATORS, LONG_SEPARATORS
+
+
+_SEPARATORS = SHORT_SEPARATORS if JSONRenderer.compact else LONG_SEPARATORS
+_ITEM_SEPARATOR, _KEY_SEPARATOR = (separator.encode('utf-8') for separator in _SEPARATORS)
+
+
+def encode_json(data):
+	"""
+	Same encoding as DRF's JSONRenderer (without indent)
+	"""
+	encoded = json.dumps(data, cls=JSONRenderer.encoder_class, ensure_ascii=JSONRenderer.ensure_ascii,
+	                     separators=_SEPARATORS)
+	return encoded.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+class EncodedJSON(bytes):
+	"""
+	A value that is already encoded JSON (e.g. an object's representation from the fragment cache, see
+	utils.viewmixins.FragmentCacheMixin), FragmentJSONRenderer writes it out as it is
+	"""
+
+
+def _contains_encoded(data):
+	if isinstance(data, EncodedJSON):
+		return True
+	if isinstance(data, dict):
+		return any(_contains_encoded(value) for value in data.values())
+	if isinstance(data, list):
+		return any(_contains_encoded(value) for value in data)
+	return False
+
+
+def _decode(data):
+	if isinstance(data, EncodedJSON):
+		return json.loads(data.decode('utf-8'))
+	if isinstance(data, dict):
+		return type(data)((key, _decode(value)) for key, value in data.items())
+	if isinstance(data, list):
+		return [_decode(value) for value in data]
+	return data
+
+
+def _splice(data):
+	if isinstance(data, EncodedJSON):
+		return data
+	if isinstance(data, dict):
+		return b'{' + _ITEM_SEPARATOR.join(
+			encode_json(str(key)) + _KEY_SEPARATOR + _splice(value) for key, value in data.items()) + b'}'
+	if isinstance(data, list):
+		return b'[' + _ITEM_SEPARATOR.join(_splice(value) for value in data) + b']'
+	return encode_json(data)
+
+
+class FragmentJSONRenderer(JSONRenderer):
+	"""
+	JSONRenderer which splices EncodedJSON values into its output as they are, so that a page of cached
+	representations costs little more than concatenating their bytes. Output is the same as JSONRenderer's, an
+	indented rendering (e.g. for the browsable API) decodes the fragments and goes through JSONRenderer itself
+	"""
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if not _contains_encoded(data):
+			return super().render(data, accepted_media_type, renderer_context)
+
+		if self.get_indent(accepted_media_type, renderer_context or {}):
+			return super().render(_decode(data), accepted_media_type, renderer_context)
+		return _splice(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+	"""
+	Newline delimited JSON, one object per line - a list is rendered one item per line, anything else (e.g. an
+	error) as a single line. The export views (see utils.viewmixins.StreamingExportMixin) stream it row by row
+	instead, with encode_line()
+	"""
+	media_type = 'application/x-ndjson'
+	format = 'ndjson'
+	charset = None
+
+	@staticmethod
+	def encode_line(data):
+		return encode_json(data) + b'\n'
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if data is None:
+			return b''
+		if isinstance(data, list):
+			return b''.join(self.encode_line(item) for item in data)
+		return self.encode_line(data)
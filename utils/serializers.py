@@ -0,0 +1,91 @@
+from django.core.exceptions import FieldDoesNotExist
+
+
+class EagerLoadingSerializerMixin(object):
+	"""
+	Lets a ModelSerializer tell the view which columns/relations it is going to read, so that the view can build
+	its queryset with select_related()/only() instead of hitting the DB once per row for related data.
+
+	Plain model fields are derived from Meta.fields, fields that are computed (SerializerMethodField etc.) should
+	declare the model lookups they read in 'field_sources', e.g.
+		field_sources = {
+			'author': ('user__first_name', 'user__last_name'),
+		}
+	"""
+	field_sources = {}
+
+	@classmethod
+	def get_eager_loading_fields(cls, fields=None):
+		"""
+		:param fields: serializer field names to consider, all of Meta.fields if None
+		:return: (select_related paths, only() lookups) tuple
+		"""
+		model = cls.Meta.model
+		fields = fields or cls.Meta.fields
+
+		related, only = set(), {model._meta.pk.name}
+		for field_name in fields:
+			if field_name in cls.field_sources:
+				lookups = cls.field_sources[field_name]
+			else:
+				try:
+					model._meta.get_field(field_name)
+				except FieldDoesNotExist:
+					continue
+				lookups = (field_name,)
+
+			for lookup in lookups:
+				parts = lookup.split('__')
+				if len(parts) > 1:
+					# Related column, join the relation and keep the FK itself loaded (django refuses to traverse
+					# a deferred FK with select_related)
+					related.add('__'.join(parts[:-1]))
+					only.add(parts[0])
+				only.add(lookup)
+
+		return related, only
+
+	@classmethod
+	def setup_eager_loading(cls, queryset, fields=None, depth=0):
+		"""
+		:param queryset: queryset to be serialized with this serializer class
+		:param fields: serializer field names which are going to be rendered, all if None
+		:param depth: serializer depth, forward relations in 'fields' are joined for depth > 0
+		:return: queryset with select_related() and only() applied
+		"""
+		related, only = cls.get_eager_loading_fields(fields)
+
+		if depth:
+			# Expanded relations are rendered with their own (nested) serializer, we don't know their column needs
+			# so just join them in full and don't restrict the columns
+			model = cls.Meta.model
+			for field_name in (fields or cls.Meta.fields):
+				try:
+					field = model._meta.get_field(field_name)
+				except FieldDoesNotExist:
+					continue
+				if field.many_to_one or field.one_to_one:
+					related.add(field_name)
+			return queryset.select_related(*related) if related else queryset
+
+		if related:
+			queryset = queryset.select_related(*related)
+		return queryset.only(*only)
+
+
+class SparseFieldsSerializerMixin(object):
+	"""
+	Lets the client ask for a subset of a ModelSerializer's fields (see utils.viewmixins.SparseFieldsMixin), passed
+	as the 'fields' kwarg - the fields not asked for are not even built. Combined with EagerLoadingSerializerMixin the
+	view reads only the columns those fields need.
+	"""
+
+	def __init__(self, *args, **kwargs):
+		self.requested_fields = kwargs.pop('fields', None)
+		super().__init__(*args, **kwargs)
+
+	def get_field_names(self, declared_fields, info):
+		field_names = super().get_field_names(declared_fields, info)
+		if self.requested_fields is None:
+			return field_names
+		return [field_name for field_name in field_names if field_name in self.requested_fields]
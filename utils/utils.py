@@ -1,4 +1,7 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core import signing
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor, _positive_int
+from rest_framework.utils.urls import replace_query_param
 
 
 class Utils:
@@ -65,4 +68,79 @@ class DictUtils:
 class CustomPagination(PageNumberPagination):
 	page_size = 5
 	page_size_query_param = 'page-size'
-	max_page_size = 1000
\ No newline at end of file
+	max_page_size = 1000
+
+
+class CustomCursorPagination(CursorPagination):
+	"""
+	Keyset pagination, the per-page cost stays constant however deep the client goes as there is no COUNT(*)
+	and no OFFSET scan - each page is a 'WHERE <order field> < position ORDER BY <order field> LIMIT n' range read.
+
+	Ordering comes from the view's OrderingFilter (see CursorPagination.get_ordering) so the same 'ordering'
+	values ('-id', 'created_on', 'updated_on'..) work, we just add 'id' as a tie-breaker so that rows sharing
+	the same timestamp always come out in the same order.
+
+	Cursors are signed, a cursor that has been tampered with, or one issued for a different ordering,
+	is rejected with 404 (same as DRF does for a malformed one).
+	"""
+	page_size = CustomPagination.page_size
+	page_size_query_param = CustomPagination.page_size_query_param
+	max_page_size = CustomPagination.max_page_size
+	ordering = '-id'
+
+	cursor_salt = 'utils.utils.CustomCursorPagination'
+
+	# Same guard as in super's decode_cursor(), offset is only used within a run of equal positions
+	offset_cutoff = 1000
+
+	def get_page_size(self, request):
+		if self.page_size_query_param:
+			try:
+				return _positive_int(
+					request.query_params[self.page_size_query_param],
+					strict=True,
+					cutoff=self.max_page_size
+				)
+			except (KeyError, ValueError):
+				pass
+		return self.page_size
+
+	def get_ordering(self, request, queryset, view):
+		ordering = super().get_ordering(request, queryset, view)
+
+		# Add unique tie-breaker, same direction as the primary order field
+		if ordering[0].lstrip('-') not in ('id', 'pk'):
+			ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+		return ordering
+
+	def decode_cursor(self, request):
+		encoded = request.query_params.get(self.cursor_query_param)
+		if encoded is None:
+			return None
+
+		try:
+			tokens = signing.loads(encoded, salt=self.cursor_salt)
+
+			# A cursor is only meaningful for the ordering it was issued for
+			if tokens.get('s') != list(self.ordering):
+				raise ValueError
+
+			offset = _positive_int(tokens.get('o', 0), cutoff=self.offset_cutoff)
+			reverse = bool(tokens.get('r', False))
+			position = tokens.get('p')
+		except (signing.BadSignature, AttributeError, TypeError, ValueError):
+			raise NotFound(self.invalid_cursor_message)
+
+		return Cursor(offset=offset, reverse=reverse, position=position)
+
+	def encode_cursor(self, cursor):
+		tokens = {'s': list(self.ordering)}
+		if cursor.offset != 0:
+			tokens['o'] = cursor.offset
+		if cursor.reverse:
+			tokens['r'] = True
+		if cursor.position is not None:
+			tokens['p'] = cursor.position
+
+		encoded = signing.dumps(tokens, salt=self.cursor_salt, compress=True)
+		return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -1,27 +1,398 @@
-# from utils.utils import Utils
-#
-#
-# class GetQuerySetMixin(object):
-# 	def get_queryset(self):
-# 		if self.queryset is None and self.model_class:
-# 			self.queryset = self.model_class.objects.all()
-# 		return super().get_queryset()
-#
-#
-# class GetModelMixin(GetQuerySetMixin):
-# 	model_class = None
-#
-# 	def get_requested_depth(self, request=None):
-# 		return Utils.query_param_int(request or self.request, 'depth', 0)
-#
-# 	def get_serializer(self, *args, **kwargs):
-# 		# See if client has requested only specific fields
-# 		fields = Utils.query_param(self.request, 'fields')
-# 		if fields:
-# 			kwargs['fields'] = Utils.str_list(fields)
-#
-# 		# Set the depth for serializer if requested
-# 		depth = self.get_requested_depth()
-# 		if depth is not None:
-# 			kwargs['depth'] = depth
-# 		return super().get_serializer(*args, **kwargs)
\ No newline at end of file
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from utils.cache import CacheVersions, get_cache, make_key
+from utils.renderers import EncodedJSON, FragmentJSONRenderer, NDJSONRenderer, encode_json
+from utils.utils import Utils, CustomCursorPagination
+
+
+class CursorPaginationMixin(object):
+	"""
+	Lets the client opt-in to keyset pagination (see utils.utils.CustomCursorPagination) on a list view
+	by passing '?pagination=cursor' (or directly a 'cursor' it got from a previous page), the view's
+	'pagination_class' is used otherwise
+	"""
+	cursor_pagination_class = CustomCursorPagination
+	pagination_mode_param = 'pagination'
+
+	def use_cursor_pagination(self):
+		request = self.request
+		return (Utils.query_param(request, self.pagination_mode_param) == 'cursor' or
+		        Utils.query_param(request, self.cursor_pagination_class.cursor_query_param) is not None)
+
+	@property
+	def paginator(self):
+		if not hasattr(self, '_paginator'):
+			if self.cursor_pagination_class and self.use_cursor_pagination():
+				self._paginator = self.cursor_pagination_class()
+			elif self.pagination_class is None:
+				self._paginator = None
+			else:
+				self._paginator = self.pagination_class()
+		return self._paginator
+
+
+class EagerLoadingMixin(object):
+	"""
+	Builds the read queryset from the serializer's declared field needs (see
+	utils.serializers.EagerLoadingSerializerMixin) so that a page of n rows is one query instead of n + 1
+	"""
+
+	def get_serializer_depth(self):
+		return 0
+
+	def get_requested_fields(self):
+		return None
+
+	def get_loaded_fields(self):
+		"""
+		:return: names of the fields to load, None for all of them
+		"""
+		fields = self.get_requested_fields()
+		if fields is None:
+			return None
+
+		# The view reads a few columns off the rows itself (see ConditionalGetMixin), keep them loaded
+		view_fields = (getattr(self, 'last_modified_field', None),) + tuple(getattr(self, 'version_fields', ()))
+		return tuple(fields) + tuple(field for field in view_fields if field)
+
+	def get_queryset(self):
+		queryset = super().get_queryset()
+		if self.request.method not in ('GET', 'HEAD'):
+			return queryset
+
+		setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+		if setup_eager_loading:
+			queryset = setup_eager_loading(queryset, fields=self.get_loaded_fields(), depth=self.get_serializer_depth())
+		return queryset
+
+
+class SparseFieldsMixin(object):
+	"""
+	Lets the client restrict the fields of the objects read with '?fields=id,title,author', the serializer has to
+	take a 'fields' kwarg (see utils.serializers.SparseFieldsSerializerMixin). Goes before EagerLoadingMixin so that
+	only the columns needed are read as well.
+
+	Writes always get all the fields
+	"""
+	fields_query_param = 'fields'
+
+	def get_requested_fields(self):
+		if self.request.method not in ('GET', 'HEAD'):
+			return None
+
+		if not hasattr(self, '_requested_fields'):
+			fields = Utils.query_param(self.request, self.fields_query_param)
+			fields = Utils.str_list(fields) if fields else None
+			if fields is not None:
+				known = self.get_serializer_class().Meta.fields
+				unknown = [field for field in fields if field not in known]
+				if unknown or not fields:
+					raise exceptions.ValidationError({self.fields_query_param: [
+						_('unknown field(s): {0}').format(', '.join(unknown)) if unknown else _('no fields given')]})
+				# normalized, no duplicates and in the serializer's order: the same fields are the same request
+				fields = [field for field in known if field in fields]
+			self._requested_fields = fields
+		return self._requested_fields
+
+	def get_serializer(self, *args, **kwargs):
+		fields = self.get_requested_fields()
+		if fields is not None:
+			kwargs['fields'] = fields
+		return super().get_serializer(*args, **kwargs)
+
+
+class DataVersionsMixin(object):
+	"""
+	Base for the caching mixins below, a view returns (from get_data_versions()) the names of the CacheVersions
+	its response depends on beyond the rows it reads, e.g. the author names
+	"""
+
+	# Query params other than the filter_class and pagination ones which change the response
+	response_params = (api_settings.SEARCH_PARAM, api_settings.ORDERING_PARAM, 'depth', 'pagination', 'fields')
+
+	def get_data_versions(self):
+		return ()
+
+	def get_response_params(self, request):
+		"""
+		:return: normalized, sorted (name, values) of the query params that change the response, anything else
+		  would just fragment the caches
+		"""
+		names = set(self.response_params)
+		filter_class = getattr(self, 'filter_class', None)
+		if filter_class:
+			names.update(filter_class.base_filters.keys())
+		paginator = getattr(self, 'paginator', None)
+		for attr in ('page_query_param', 'page_size_query_param', 'cursor_query_param'):
+			if getattr(paginator, attr, None):
+				names.add(getattr(paginator, attr))
+
+		return sorted((name, request.query_params.getlist(name)) for name in names if request.query_params.get(name))
+
+
+def _is_not_modified(request, etag, last_modified=None):
+	"""
+	:param last_modified: only if it changes whenever the representation does, else If-Modified-Since is ignored and
+	  only If-None-Match can get a 304
+	"""
+	if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+	if if_none_match:
+		# If-Modified-Since is ignored when If-None-Match is present (RFC 7232, 3.3)
+		etags = parse_etags(if_none_match)
+		return etag is not None and ('*' in etags or etag in etags)
+
+	if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+	return bool(if_modified_since and last_modified and last_modified <= if_modified_since)
+
+
+def _set_validators(response, etag, last_modified):
+	if etag is not None:
+		response['ETag'] = quote_etag(etag)
+	if last_modified is not None:
+		response['Last-Modified'] = http_date(last_modified)
+	return response
+
+
+class ConditionalGetMixin(DataVersionsMixin):
+	"""
+	Strong ETag and Last-Modified on detail and list GETs, derived from the 'id' and 'updated_on' of the object
+	(detail) or of the page's objects plus a hash of the query (list), answered with 304 when the client already has
+	the current representation.
+
+	Last-Modified is only a validator when 'updated_on' is all the representation depends on, i.e on detail views
+	without 'version_fields' and data versions. Deletes, page shifts, counters and author renames don't move it, so
+	anywhere else it is sent for information only and If-Modified-Since never gets a 304, the ETag covers all of them.
+
+	The detail view finds out with a pk lookup reading only 'updated_on' before anything is serialized, the list view
+	once the page rows are read, still saving the serialization and the transfer
+	"""
+	last_modified_field = 'updated_on'
+
+	# Model fields that can change without 'updated_on' changing (e.g. denormalized counters)
+	version_fields = ()
+
+	def _etag(self, request, *parts):
+		material = (
+			request.accepted_renderer.format,
+			self.get_response_params(request),
+			CacheVersions.get_many(self.get_data_versions()),
+		) + parts
+		return hashlib.md5(repr(material).encode('utf-8')).hexdigest()
+
+	@staticmethod
+	def _timestamp(value):
+		return timegm(value.utctimetuple()) if value else None
+
+	def get_object_version(self):
+		"""
+		:return: (pk, updated_on, *version_fields) of the requested object, None if it doesn't exist
+		"""
+		lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+		return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).values_list(
+			'pk', self.last_modified_field, *self.version_fields).first()
+
+	def retrieve(self, request, *args, **kwargs):
+		if request.method not in ('GET', 'HEAD'):
+			return super().retrieve(request, *args, **kwargs)
+
+		version = self.get_object_version()
+		if version is None:
+			return super().retrieve(request, *args, **kwargs)  # let it 404 as usual
+
+		etag = self._etag(request, version[0], version[1] and version[1].isoformat(), version[2:])
+		last_modified = self._timestamp(version[1])
+		validates = not self.version_fields and not self.get_data_versions()
+		if _is_not_modified(request, etag, last_modified if validates else None):
+			return _set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+		return _set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+	def get_pagination_state(self):
+		# Parts of the paginated envelope which are not derived from the page rows themselves
+		paginator = self.paginator
+		page = getattr(paginator, 'page', None)
+		if hasattr(page, 'paginator'):
+			return page.paginator.count
+		return getattr(paginator, 'has_next', None), getattr(paginator, 'has_previous', None)
+
+	def list(self, request, *args, **kwargs):
+		queryset = self.filter_queryset(self.get_queryset())
+		page = self.paginate_queryset(queryset)
+		objects = list(page if page is not None else queryset)
+
+		field = self.last_modified_field
+		last_modified = max((getattr(obj, field) for obj in objects if getattr(obj, field)), default=None)
+
+		versions = [(obj.pk, getattr(obj, field) and getattr(obj, field).isoformat()) +
+		            tuple(getattr(obj, name) for name in self.version_fields) for obj in objects]
+		etag = self._etag(request, versions, self.get_pagination_state() if page is not None else None)
+		last_modified = self._timestamp(last_modified)
+		if request.method in ('GET', 'HEAD') and _is_not_modified(request, etag):
+			return _set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+		data = self.get_page_data(objects)
+		if page is not None:
+			response = self.get_paginated_response(data)
+		else:
+			response = Response(data)
+		return _set_validators(response, etag, last_modified)
+
+	def get_page_data(self, objects):
+		return self.get_serializer(objects, many=True).data
+
+
+class FragmentCacheMixin(object):
+	"""
+	Caches each object's representation already encoded as JSON, a list page is then mostly spliced together from
+	the cache by FragmentJSONRenderer instead of serialized and encoded field by field. Goes before
+	ConditionalGetMixin, whose list() reads the page rows.
+
+	A fragment is keyed on the object's pk, 'last_modified_field' and 'version_fields' (as for the ETag, see
+	ConditionalGetMixin) along with the requested fields and depth and the CacheVersions named in
+	'fragment_data_versions' - the data from other tables the representation includes, e.g. the author names.
+	Expanded (depth > 0) representations include other objects which aren't part of the key, they are never cached
+	"""
+	renderer_classes = (FragmentJSONRenderer, BrowsableAPIRenderer)
+	fragment_data_versions = ()
+	fragment_cache_prefix = None
+
+	def is_fragment_cacheable(self, request):
+		return (getattr(settings, 'FRAGMENT_CACHE', {}).get('ENABLED', False) and
+		        isinstance(request.accepted_renderer, FragmentJSONRenderer) and not self.get_serializer_depth())
+
+	def get_fragment_key(self, obj, versions):
+		field = self.last_modified_field
+		fields = self.get_requested_fields()
+		return make_key(self.fragment_cache_prefix or obj._meta.label_lower, obj.pk,
+		                getattr(obj, field) and getattr(obj, field).isoformat(),
+		                tuple(getattr(obj, name) for name in self.version_fields),
+		                tuple(fields) if fields is not None else None, self.get_serializer_depth(), versions)
+
+	def get_page_data(self, objects):
+		if not self.is_fragment_cacheable(self.request):
+			return super().get_page_data(objects)
+
+		cache = get_cache()
+		versions = CacheVersions.get_many(self.fragment_data_versions)
+		keys = [self.get_fragment_key(obj, versions) for obj in objects]
+		cached = cache.get_many(keys)
+
+		missing = [(key, obj) for key, obj in zip(keys, objects) if key not in cached]
+		if missing:
+			encoded = {key: encode_json(data) for (key, obj), data in
+			           zip(missing, super().get_page_data([obj for key, obj in missing]))}
+			cache.set_many(encoded, getattr(settings, 'FRAGMENT_CACHE', {}).get('TIMEOUT', 3600))
+			cached.update(encoded)
+
+		return [EncodedJSON(cached[key]) for key in keys]
+
+
+class ResponseCacheMixin(DataVersionsMixin):
+	"""
+	Caches the (serialized) list response of anonymous GETs, keyed on the normalized query string and on the
+	CacheVersions returned by get_data_versions() so that a write invalidates all affected pages in O(1)
+	"""
+	response_cache_prefix = None
+
+	def is_response_cacheable(self, request):
+		return (getattr(settings, 'RESPONSE_CACHE', {}).get('ENABLED', False) and
+		        request.method == 'GET' and request.auth is None)
+
+	def get_response_cache_key(self, request):
+		versions = CacheVersions.get_many(self.get_data_versions())
+
+		# pagination links are absolute, hence the host
+		return make_key(self.response_cache_prefix or type(self).__name__,
+		                request.get_host(), request.accepted_renderer.format, versions, self.get_response_params(request))
+
+	def list(self, request, *args, **kwargs):
+		if not self.is_response_cacheable(request):
+			return super().list(request, *args, **kwargs)
+
+		cache = get_cache()
+		key = self.get_response_cache_key(request)
+		cached = cache.get(key)
+		if cached is not None:
+			data, etag, last_modified = cached
+			if _is_not_modified(request, etag):  # a list's Last-Modified isn't a validator, see ConditionalGetMixin
+				return _set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+			return _set_validators(Response(data), etag, last_modified)
+
+		response = super().list(request, *args, **kwargs)
+		if response.status_code == 200:
+			etag = response.get('ETag')
+			last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+			cache.set(key, (response.data, etag and parse_etags(etag)[0], last_modified),
+			          getattr(settings, 'RESPONSE_CACHE', {}).get('TIMEOUT', 300))
+		return response
+
+
+class StreamingExportMixin(object):
+	"""
+	Streams every row of the (filtered) queryset in a single response, as a JSON array or as NDJSON
+	('?format=ndjson' or 'Accept: application/x-ndjson'). Rows are read in primary key order 'export_batch_size' at
+	a time, each batch a keyset query starting after the last pk of the previous one, so memory stays constant
+	however many rows there are and no batch gets slower than the first (unlike OFFSET paging)
+
+	A batch is serialized with the view's serializer, override get_export_rows(batch) to add to (or replace) the
+	representations
+	"""
+	renderer_classes = (JSONRenderer, NDJSONRenderer)
+	export_batch_size = 1000
+
+	def get_export_queryset(self):
+		return self.filter_queryset(self.get_queryset())
+
+	def iter_batches(self, queryset):
+		last_pk = None
+		while True:
+			batch = queryset.order_by('pk')
+			if last_pk is not None:
+				batch = batch.filter(pk__gt=last_pk)
+			batch = list(batch[:self.export_batch_size].iterator())
+			if not batch:
+				return
+			yield batch
+			if len(batch) < self.export_batch_size:
+				return
+			last_pk = batch[-1].pk
+
+	def get_export_rows(self, batch):
+		"""
+		:return: the representations of a batch of objects
+		"""
+		return self.get_serializer(batch, many=True).data
+
+	def stream_ndjson(self, queryset):
+		for batch in self.iter_batches(queryset):
+			yield b''.join(NDJSONRenderer.encode_line(row) for row in self.get_export_rows(batch))
+
+	def stream_json(self, queryset):
+		separator = b'['
+		for batch in self.iter_batches(queryset):
+			rows = self.get_export_rows(batch)
+			if rows:
+				yield separator + b','.join(encode_json(row) for row in rows)
+				separator = b','
+		yield b'[]' if separator == b'[' else b']'
+
+	def get(self, request, *args, **kwargs):
+		# anything wrong with the request (filters, 404 etc.) has to come out now, before the 200 is sent
+		queryset = self.get_export_queryset()
+
+		renderer = request.accepted_renderer
+		if isinstance(renderer, NDJSONRenderer):
+			stream = self.stream_ndjson(queryset)
+		else:
+			stream = self.stream_json(queryset)
+		return StreamingHttpResponse(stream, content_type='{0}; charset=utf-8'.format(renderer.media_type))